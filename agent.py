@@ -1,7 +1,8 @@
 import os
 import random
 import copy
-from collections import namedtuple, deque
+import threading
+from contextlib import nullcontext
 
 import torch
 import numpy as np
@@ -9,6 +10,7 @@ import torch.optim as optim
 import torch.nn.functional as F
 
 from model import Actor, Critic
+from timing import PhaseTimer
 
 if torch.cuda.is_available():
     device = torch.device("cuda:0")
@@ -41,6 +43,19 @@ class Agent:
         starting_noise_factor=1,
         noise_decay=0.995,
         update_every=2**4,
+        prioritized_replay=False,
+        replay_on_device=False,
+        replay_dir=None,
+        compact_replay=False,
+        num_agents=1,
+        replay_float16=False,
+        per_alpha=0.6,
+        per_beta=0.4,
+        per_beta_increment=1e-4,
+        async_learning=False,
+        max_update_ratio=None,
+        profile=False,
+        mixed_precision=False,
     ):
         """DDPG agent
         This class instantiates a DDPG agent.
@@ -62,6 +77,45 @@ class Agent:
                                  time the agent learns. Reduces Noise with time.
             update_every (int): number of episodes after which the agent target network weights
                                 are updated.
+            prioritized_replay (bool): sample experiences proportionally to their
+                                       TD error instead of uniformly.
+            replay_on_device (bool): keep the replay buffer as torch tensors on
+                                     the training device.
+            replay_dir (str): keep the replay buffer in memory-mapped files in
+                              this directory, reopening them if they exist.
+            compact_replay (bool): store every observation once and rebuild
+                                   next states by index arithmetic. Needs
+                                   whole environment steps, see `step_all`.
+                                   prioritized_replay, replay_on_device,
+                                   replay_dir and compact_replay can not be
+                                   combined.
+            num_agents (int): agents per environment step. Sizes the
+                              per-agent noise of `act_all`, so `act_all`
+                              with noise, `step_all` and `reset_noise`
+                              raise a ValueError for any other number of
+                              rows; also used by compact_replay.
+            replay_float16 (bool): store observations as float16, for
+                                   compact_replay.
+            per_alpha (float): how much prioritization is used, 0 is uniform.
+            per_beta (float): initial importance-sampling correction, annealed to 1.
+            per_beta_increment (float): amount added to per_beta on every sample.
+            async_learning (bool): learn continuously on a background thread
+                                   instead of inline in `step`.
+            max_update_ratio (float): with async_learning, pause the learner
+                                      while it is more than this many
+                                      learning passes per stored experience
+                                      ahead. Unlimited when None.
+            profile (bool): record wall time and call counts of acting,
+                            replay sampling, the critic and actor steps and
+                            the target updates, see `timings`.
+            mixed_precision (bool): run the forward and backward passes of
+                                    `learn` under bfloat16 autocast. Weights,
+                                    optimizer state, losses and TD errors
+                                    stay float32. The casts cost more than
+                                    the default layer sizes save, so learning
+                                    rounds are slower than float32 on CPU;
+                                    see benchmarks.mixed_precision for the
+                                    convergence of both.
         """
 
         self.state_size = state_size
@@ -78,7 +132,12 @@ class Agent:
         self.noise_factor = starting_noise_factor
         self.noise_decay = noise_decay
         self.update_every = update_every
+        self.prioritized_replay = prioritized_replay
         self.last_episode_train = 0
+        self.experiences_seen = 0  # experiences added to the replay buffer
+        self.learn_steps = 0  # learning passes (gradient updates) done
+        self.timer = PhaseTimer(enabled=profile)
+        self.mixed_precision = mixed_precision
 
         # Actor Network
         self.actor_local = Actor(
@@ -123,39 +182,340 @@ class Agent:
         )
 
         # Initialize target networks weights with the local networks ones
+        self._param_lists = {}  # (target, local) tensors used by soft_update
         self.soft_update(self.actor_local, self.actor_target, 1)
         self.soft_update(self.critic_local, self.critic_target, 1)
 
+        # Inference copy of the actor used by `act_all`. It is kept in eval
+        # mode, so acting never has to toggle BatchNorm on actor_local.
+        # It is double-buffered: new weights are written into the back copy,
+        # which is then swapped in under _actor_lock.
+        self.actor_inference = copy.deepcopy(self.actor_local).eval()
+        for param in self.actor_inference.parameters():
+            param.requires_grad_(False)
+        self._actor_back = copy.deepcopy(self.actor_inference)
+        self._actor_lock = threading.Lock()
+
         # Replay Buffer
-        self.replay_buffer = ReplayBuffer(
-            action_size, seed, buffer_size, batch_size
+        storage_options = (
+            prioritized_replay,
+            replay_on_device,
+            replay_dir is not None,
+            compact_replay,
         )
+        if sum(storage_options) > 1:
+            raise ValueError(
+                "Only one of prioritized_replay, replay_on_device, "
+                "replay_dir and compact_replay can be used"
+            )
+        if prioritized_replay:
+            self.replay_buffer = PrioritizedReplayBuffer(
+                state_size,
+                action_size,
+                seed,
+                buffer_size,
+                batch_size,
+                alpha=per_alpha,
+                beta=per_beta,
+                beta_increment=per_beta_increment,
+            )
+        elif replay_dir is not None:
+            self.replay_buffer = MemmapReplayBuffer(
+                state_size,
+                action_size,
+                seed,
+                buffer_size,
+                batch_size,
+                replay_dir,
+            )
+        elif compact_replay:
+            self.replay_buffer = CompactReplayBuffer(
+                state_size,
+                action_size,
+                seed,
+                buffer_size,
+                batch_size,
+                num_agents,
+                obs_dtype=np.float16 if replay_float16 else np.float32,
+            )
+        else:
+            replay_class = (
+                DeviceReplayBuffer if replay_on_device else ReplayBuffer
+            )
+            self.replay_buffer = replay_class(
+                state_size, action_size, seed, buffer_size, batch_size
+            )
 
         # Noise process
         self.noise = OUNoise(action_size, seed)
+        # One process per agent, used by act_all
+        self.batch_noise = VectorOUNoise(num_agents, action_size, seed)
+
+        # Guards the replay buffer against the background learner
+        self._replay_lock = threading.Lock()
+        # Replay slot referenced by the last committed snapshot, per directory
+        self._snapshot_slots = {}
+        self.learner = None
+        if async_learning:
+            self.learner = AsyncLearner(self, max_update_ratio)
+            self.learner.start()
 
     def act(self, state, noise=True):
         """Returns actions for given state as per current policy."""
-        state = torch.from_numpy(state).float().to(device)
+        with self.timer("act"):
+            state = torch.from_numpy(state).float().to(device)
+
+            if self.learner is not None:
+                # actor_local is being trained on another thread
+                with self._actor_lock, torch.no_grad():
+                    action = self.actor_inference(state).cpu().numpy()
+            else:
+                self.actor_local.eval()  # setting to eval mode
+                with torch.no_grad():
+                    action = self.actor_local(state).data.cpu().numpy()
+                self.actor_local.train()  # setting to train mode
+
+            if noise:
+                # Add noise to the action in order to explore the environment
+                val = self.noise_factor * self.noise.sample()
+                action += val
 
-        self.actor_local.eval()  # setting to eval mode
-        with torch.no_grad():
-            action = self.actor_local(state).data.cpu().numpy()
-        self.actor_local.train()  # setting to train mode
+            return np.clip(action, -1, 1)
 
-        if noise:
-            # Add noise to the action in order to explore the environment
-            val = self.noise_factor * self.noise.sample()
-            action += val
+    def act_all(self, states, noise=True):
+        """Returns actions for every agent as per current policy.
+
+        All agents are evaluated in a single forward pass of the inference
+        copy of the actor.
+        Args:
+            states (np.ndarray): (num_agents, state_size) observation matrix,
+                                 e.g. `BrainInfo.vector_observations`.
+            noise (bool): add exploration noise, one process per agent.
+                          The agent must have been created with
+                          `num_agents` equal to the number of rows.
+        Returns:
+            np.ndarray: (num_agents, action_size) actions clipped to [-1, 1],
+                        ready to be passed to `UnityEnvironment.step`.
+        """
+        with self.timer("act"):
+            states = torch.from_numpy(np.asarray(states, dtype=np.float32))
+            with self._actor_lock, torch.no_grad():
+                actions = self.actor_inference(states.to(device)).cpu().numpy()
+
+            if noise:
+                if actions.shape[0] != self.batch_noise.n_agents:
+                    raise ValueError(
+                        "act_all got {} states, but the agent was created "
+                        "with num_agents={}".format(
+                            actions.shape[0], self.batch_noise.n_agents
+                        )
+                    )
+                actions += self.noise_factor * self.batch_noise.sample()
+
+            return np.clip(actions, -1, 1, out=actions)
+
+    def sync_actor(self):
+        """Copy the weights of actor_local into the inference actor.
+
+        Called after every learning round. Call it yourself after loading
+        weights into actor_local directly.
+        The weights are copied into the back buffer while acting carries on
+        with the front one, then both are swapped.
+        """
+        self._actor_back.load_state_dict(self.actor_local.state_dict())
+        with self._actor_lock:
+            self.actor_inference, self._actor_back = (
+                self._actor_back,
+                self.actor_inference,
+            )
 
-        return np.clip(action, -1, 1)
+    def timings(self):
+        """Returns the recorded phase timings and the learning counters.
+
+        {"elapsed": s, "phases": {phase: {"seconds", "calls", "share"}},
+        "experiences_seen": n, "learn_steps": n}, with the phases "act",
+        "sample", "critic", "actor" and "soft_update". Phases are only
+        recorded when the agent was created with profile=True; call
+        `timer.reset()` to start a new measurement window. On CUDA the
+        learning phases measure kernel launches, not kernel execution.
+        """
+        timings = self.timer.snapshot()
+        timings["experiences_seen"] = self.experiences_seen
+        timings["learn_steps"] = self.learn_steps
+        return timings
+
+    @property
+    def update_to_data_ratio(self):
+        """Learning passes done per experience stored so far."""
+        return self.learn_steps / max(1, self.experiences_seen)
+
+    def close(self):
+        """Stop the background learner, if any."""
+        if self.learner is not None:
+            self.learner.stop()
+            self.learner = None
+
+    def snapshot(self, path):
+        """Write the full training state of the agent into the directory `path`.
+
+        Saves the local and target networks, both optimizers, the noise
+        processes and schedule, the counters, the random number generators
+        and the replay buffer. The replay buffer alternates between the
+        slots `path`/replay/0 and `path`/replay/1: it is written
+        incrementally (see ReplayBuffer.save) into the slot the current
+        snapshot does not use, then everything else goes into
+        `path`/agent.pth, which is replaced atomically and names the new
+        slot. A crash while saving leaves the previous snapshot intact.
+        A MemmapReplayBuffer is not copied: only its flushed cursor is
+        saved, and its files keep changing as training goes on.
+        """
+        os.makedirs(path, exist_ok=True)
+        filename = os.path.join(path, "agent.pth")
+        key = os.path.abspath(path)
+        if key not in self._snapshot_slots:
+            self._snapshot_slots[key] = None
+            if os.path.exists(filename):
+                self._snapshot_slots[key] = torch.load(
+                    filename, map_location="cpu", weights_only=False
+                )["replay_slot"]
+        slot = 1 if self._snapshot_slots[key] == 0 else 0
+
+        learner_lock = self.learner.lock if self.learner else nullcontext()
+        with learner_lock, self._replay_lock:
+            replay_state = self.replay_buffer.save(
+                os.path.join(path, "replay", str(slot))
+            )
+            state = {
+                "actor_local": self.actor_local.state_dict(),
+                "actor_target": self.actor_target.state_dict(),
+                "critic_local": self.critic_local.state_dict(),
+                "critic_target": self.critic_target.state_dict(),
+                "actor_optimizer": self.actor_optimizer.state_dict(),
+                "critic_optimizer": self.critic_optimizer.state_dict(),
+                "noise_factor": self.noise_factor,
+                "last_episode_train": self.last_episode_train,
+                "experiences_seen": self.experiences_seen,
+                "learn_steps": self.learn_steps,
+                "noise": self.noise.state,
+                "batch_noise": self.batch_noise.state_dict(),
+                "replay_class": type(self.replay_buffer).__name__,
+                "replay": replay_state,
+                "replay_slot": slot,
+                "random": random.getstate(),
+                "np_random": np.random.get_state(),
+                "torch_random": torch.get_rng_state(),
+            }
+            torch.save(state, filename + ".tmp")
+            os.replace(filename + ".tmp", filename)
+        self._snapshot_slots[key] = slot
+
+    def restore(self, path):
+        """Load a training state written by `snapshot` from `path`.
+
+        The agent must have been created with the same sizes and replay
+        options as the one that wrote the snapshot.
+        """
+        # Load on the CPU: the random number generator states must stay
+        # there, and load_state_dict copies the network and optimizer
+        # tensors onto the device of the parameters they belong to.
+        state = torch.load(
+            os.path.join(path, "agent.pth"),
+            map_location="cpu",
+            weights_only=False,
+        )
+        replay_class = type(self.replay_buffer).__name__
+        if state["replay_class"] != replay_class:
+            raise ValueError(
+                "Snapshot holds a {}, this agent uses a {}".format(
+                    state["replay_class"], replay_class
+                )
+            )
+        learner_lock = self.learner.lock if self.learner else nullcontext()
+        with learner_lock, self._replay_lock:
+            self.actor_local.load_state_dict(state["actor_local"])
+            self.actor_target.load_state_dict(state["actor_target"])
+            self.critic_local.load_state_dict(state["critic_local"])
+            self.critic_target.load_state_dict(state["critic_target"])
+            self.actor_optimizer.load_state_dict(state["actor_optimizer"])
+            self.critic_optimizer.load_state_dict(state["critic_optimizer"])
+            self.sync_actor()
+
+            self.noise_factor = state["noise_factor"]
+            self.last_episode_train = state["last_episode_train"]
+            self.experiences_seen = state["experiences_seen"]
+            self.learn_steps = state["learn_steps"]
+            self.noise.state = state["noise"]
+            self.batch_noise.load_state_dict(state["batch_noise"])
+
+            slot = state["replay_slot"]
+            self.replay_buffer.load(
+                os.path.join(path, "replay", str(slot)), state["replay"]
+            )
+            self._snapshot_slots[os.path.abspath(path)] = slot
+            random.setstate(state["random"])
+            np.random.set_state(state["np_random"])
+            torch.set_rng_state(state["torch_random"])
 
     def step(
         self, states, actions, rewards, next_states, dones, episode_number=0
     ):
         """Save experience in replay buffer, and use random sample from buffer to learn."""
         # Save experience
-        self.replay_buffer.add(states, actions, rewards, next_states, dones)
+        with self._replay_lock:
+            self.replay_buffer.add(
+                states, actions, rewards, next_states, dones
+            )
+        self.experiences_seen += 1
+        self._maybe_learn(episode_number)
+
+    def step_all(
+        self, states, actions, rewards, next_states, dones, episode_number=0
+    ):
+        """Save one environment step of every agent, then maybe learn.
+
+        Same as calling `step` once per agent, but the experiences are
+        written to the replay buffer in one go and the learning schedule is
+        checked once per environment step.
+        Args:
+            states (np.ndarray): (num_agents, state_size) states.
+            actions (np.ndarray): (num_agents, action_size) actions.
+            rewards (array-like): num_agents rewards.
+            next_states (np.ndarray): (num_agents, state_size) next states.
+            dones (array-like): num_agents done flags.
+            episode_number (int): current episode, drives `update_every`.
+        """
+        # Checks the number of agents before anything is stored
+        self.reset_noise(dones)
+        with self._replay_lock:
+            self.replay_buffer.add_batch(
+                states, actions, rewards, next_states, dones
+            )
+        self.experiences_seen += len(states)
+        self._maybe_learn(episode_number)
+
+    def reset_noise(self, dones=None):
+        """Reset the noise process of the agents flagged in `dones`.
+
+        Args:
+            dones (array-like): one flag per agent, e.g. `local_done`.
+                                Resets every agent when None.
+        """
+        if dones is not None and len(dones) != self.batch_noise.n_agents:
+            raise ValueError(
+                "Got {} done flags, but the agent was created with "
+                "num_agents={}".format(len(dones), self.batch_noise.n_agents)
+            )
+        self.batch_noise.reset(dones)
+
+    def _maybe_learn(self, episode_number):
+        """Run a learning round if the `update_every` schedule says so.
+
+        With a background learner, only the noise schedule is applied here.
+        """
+        if self.learner is not None and self.learner.error is not None:
+            raise RuntimeError("The learner thread failed") from (
+                self.learner.error
+            )
 
         # Learn, if enough samples are available in memory
         if len(self.replay_buffer) > self.batch_size:
@@ -163,17 +523,35 @@ class Agent:
                 episode_number % self.update_every == 0
                 and self.last_episode_train != episode_number
             ):
-                for _ in range(self.learning_passes):
-                    experiences = self.replay_buffer.sample()
-                    self.learn(experiences)
-
+                if self.learner is None:
+                    self.learn_round()
+                    self.sync_actor()
                 self.last_episode_train = episode_number
 
                 # Decay the noise process
                 self.noise_factor *= self.noise_decay
                 self.noise.reset()
+                self.reset_noise()
+
+    def learn_round(self):
+        """Run `learning_passes` learning passes on replay samples."""
+        if self.prioritized_replay:
+            # Priorities change after every pass, so sample each one
+            for _ in range(self.learning_passes):
+                with self._replay_lock, self.timer("sample"):
+                    experiences, weights, idx = self.replay_buffer.sample()
+                td_errors = self.learn(experiences, weights)
+                with self._replay_lock:
+                    self.replay_buffer.update_priorities(
+                        idx, td_errors.abs().cpu().numpy().ravel()
+                    )
+        else:
+            with self._replay_lock, self.timer("sample"):
+                passes = self.replay_buffer.sample_passes(self.learning_passes)
+            for experiences in passes:
+                self.learn(experiences)
 
-    def learn(self, experiences):
+    def learn(self, experiences, weights=None):
         """Update policy and value parameters using given batch of experience tuples.
         Q_targets = r + γ * critic_target(next_state, actor_target(next_state))
         where:
@@ -183,57 +561,165 @@ class Agent:
         Params
         ======
             experiences (Tuple[torch.Tensor]): tuple of (s, a, r, s') tuples
+            weights (torch.Tensor): importance-sampling weight of each
+                                    experience, uniform when None
+        Returns
+        =======
+            torch.Tensor: TD errors of the critic for the given experiences
         """
         states, actions, rewards, next_states, dones = experiences
-        weights = torch.ones_like(dones)
 
         # ---------------------------- update critic ---------------------------- #
-        with torch.no_grad():
-            # Get predicted next-state actions from actor_target model
-            actions_next = self.actor_target(next_states)
-            # Get predicted next-state Q-Values from critic_target model
-            Q_targets_next = self.critic_target(next_states, actions_next)
-        # Compute Q targets for current states (y_i)
-        Q_targets = rewards + (self.gamma * Q_targets_next * (1 - dones))
-        Q_targets = torch.mul(Q_targets, weights)
-        # Compute critic loss
-        Q_expected = self.critic_local(states, actions)
-        critic_loss = F.mse_loss(Q_expected, Q_targets)
-        # Minimize the loss
-        self.critic_optimizer.zero_grad()
-        critic_loss.backward()
-        # torch.nn.utils.clip_grad_norm_(self.critic_local.parameters(), 0.5) #TODO
-        self.critic_optimizer.step()
+        with self.timer("critic"):
+            with torch.no_grad(), self._autocast():
+                # Get predicted next-state actions from actor_target model
+                actions_next = self.actor_target(next_states)
+                # Get predicted next-state Q-Values from critic_target model
+                Q_targets_next = self.critic_target(next_states, actions_next)
+            # Compute Q targets for current states (y_i)
+            Q_targets = rewards + (
+                self.gamma * Q_targets_next.float() * (1 - dones)
+            )
+            # Compute critic loss
+            with self._autocast():
+                Q_expected = self.critic_local(states, actions)
+            Q_expected = Q_expected.float()
+            if weights is None:
+                critic_loss = F.mse_loss(Q_expected, Q_targets)
+            else:
+                critic_loss = (weights * (Q_expected - Q_targets) ** 2).mean()
+            # Minimize the loss
+            self.critic_optimizer.zero_grad()
+            critic_loss.backward()
+            # torch.nn.utils.clip_grad_norm_(self.critic_local.parameters(), 0.5) #TODO
+            self.critic_optimizer.step()
 
         # ---------------------------- update actor ---------------------------- #
-        # Compute actor loss
-        actions_pred = self.actor_local(states)
-        actor_loss = -self.critic_local(states, actions_pred).mean()
-        # Minimize the loss
-        self.actor_optimizer.zero_grad()
-        actor_loss.backward()
-        self.actor_optimizer.step()
+        with self.timer("actor"):
+            # Compute actor loss
+            with self._autocast():
+                actions_pred = self.actor_local(states)
+                Q_pred = self.critic_local(states, actions_pred)
+            actor_loss = -Q_pred.float().mean()
+            # Minimize the loss
+            self.actor_optimizer.zero_grad()
+            actor_loss.backward()
+            self.actor_optimizer.step()
 
         # ----------------------- update target networks ----------------------- #
-        self.soft_update(self.critic_local, self.critic_target, tau=self.tau)
-        self.soft_update(self.actor_local, self.actor_target, tau=self.tau)
+        with self.timer("soft_update"):
+            self.soft_update(
+                self.critic_local, self.critic_target, tau=self.tau
+            )
+            self.soft_update(self.actor_local, self.actor_target, tau=self.tau)
+
+        self.learn_steps += 1
+        return (Q_targets - Q_expected).detach()
+
+    def _autocast(self):
+        """bfloat16 autocast context with mixed_precision, else a no-op."""
+        if not self.mixed_precision:
+            return nullcontext()
+        return torch.autocast(device.type, dtype=torch.bfloat16)
 
     def soft_update(self, local_model, target_model, tau=1e-3):
         """Soft update model parameters.
 
         Update using the following formula
         θ_target = τ*θ_local + (1 - τ)*θ_target
+        The update is a single fused, in-place lerp over all parameters of
+        the model, so no temporary tensors are allocated. With tau=1 it is
+        an exact copy, which is how the targets are initialized.
         Args:
             local_model (PyTorch model): weights will be copied from
             target_model (PyTorch model): weights will be copied to
             tau (float): interpolation parameter
         """
-        for target_param, local_param in zip(
-            target_model.parameters(), local_model.parameters()
-        ):
-            target_param.data.copy_(
-                tau * local_param.data + (1.0 - tau) * target_param.data
+        key = (id(local_model), id(target_model))
+        if key not in self._param_lists:
+            self._param_lists[key] = (
+                [p.data for p in target_model.parameters()],
+                [p.data for p in local_model.parameters()],
             )
+        target_params, local_params = self._param_lists[key]
+        lerp_(target_params, local_params, tau)
+
+
+def lerp_(targets, sources, weight):
+    """In-place θ_target += weight * (θ_source - θ_target) over tensor lists."""
+    if hasattr(torch, "_foreach_lerp_"):
+        torch._foreach_lerp_(targets, sources, weight)
+    else:
+        for target, source in zip(targets, sources):
+            target.lerp_(source, weight)
+
+
+class AsyncLearner:
+    """Runs learning rounds of an Agent on a background thread.
+
+    The learner keeps consuming replay minibatches while the environment
+    is stepped, and publishes the new actor weights to the agent's
+    inference actor after every round. PyTorch releases the GIL inside its
+    kernels, so on a multi-core CPU acting and learning overlap.
+    """
+
+    def __init__(self, agent, max_update_ratio=None):
+        """Initialize an AsyncLearner.
+
+        Params
+        ======
+            agent (Agent): agent whose networks are trained
+            max_update_ratio (float): pause while agent.update_to_data_ratio
+                                      is above this value, None for no limit
+        """
+        self.agent = agent
+        self.max_update_ratio = max_update_ratio
+        self.rounds = 0
+        self.error = None
+        self.lock = threading.Lock()  # held for the duration of a round
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="ddpg-learner", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Return the learner counters as a dict."""
+        agent = self.agent
+        return {
+            "rounds": self.rounds,
+            "learn_steps": agent.learn_steps,
+            "experiences_seen": agent.experiences_seen,
+            "update_to_data_ratio": agent.update_to_data_ratio,
+        }
+
+    def _ready(self):
+        agent = self.agent
+        if len(agent.replay_buffer) <= agent.batch_size:
+            return False
+        return (
+            self.max_update_ratio is None
+            or agent.update_to_data_ratio < self.max_update_ratio
+        )
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if not self._ready():
+                    self._stop.wait(1e-3)
+                    continue
+                with self.lock:
+                    self.agent.learn_round()
+                    self.agent.sync_actor()
+                self.rounds += 1
+        except Exception as e:  # reported to the acting thread
+            self.error = e
 
 
 class OUNoise:
@@ -269,11 +755,103 @@ class OUNoise:
         return self.state
 
 
+class VectorOUNoise:
+    """Independent Ornstein-Uhlenbeck processes for many agents.
+
+    The state of every process is one row of an (n_agents, action_size)
+    matrix that is advanced in place. Gaussian increments are drawn from a
+    dedicated np.random.Generator in blocks of `block_size` steps, so a
+    sample neither allocates nor calls the generator.
+    """
+
+    def __init__(
+        self,
+        n_agents,
+        action_size,
+        seed,
+        mu=0.0,
+        theta=0.15,
+        sigma=0.2,
+        block_size=1024,
+    ):
+        """Initialize parameters and noise processes.
+
+        Params
+        ======
+            n_agents (int): number of independent processes
+            action_size (int): dimension of each process
+            seed (int): seed of the generator
+            mu (float): long-running mean
+            theta (float): speed of mean reversion
+            sigma (float): volatility
+            block_size (int): number of steps generated at once
+        """
+        self.n_agents = n_agents
+        self.action_size = action_size
+        self.mu = mu
+        self.theta = theta
+        self.sigma = sigma
+        self.block_size = block_size
+        self.rng = np.random.default_rng(seed)
+        self.state = np.empty((n_agents, action_size))
+        self._block = np.empty((block_size, n_agents, action_size))
+        self._next = block_size  # forces a refill on the first sample
+        self.reset()
+
+    def state_dict(self):
+        """Return the state of the processes and of the generator."""
+        return {
+            "state": self.state.copy(),
+            "rng": self.rng.bit_generator.state,
+            "block": self._block.copy(),
+            "next": self._next,
+        }
+
+    def load_state_dict(self, state):
+        self.state[:] = state["state"]
+        self.rng.bit_generator.state = state["rng"]
+        self._block[:] = state["block"]
+        self._next = state["next"]
+
+    def reset(self, mask=None):
+        """Reset the processes selected by `mask` (all if None) to mu."""
+        if mask is None:
+            self.state.fill(self.mu)
+        else:
+            self.state[np.asarray(mask, dtype=bool)] = self.mu
+
+    def sample(self):
+        """Advance every process by one step and return the state matrix.
+
+        The returned array is updated in place by the next call.
+        """
+        if self._next == self.block_size:
+            self.rng.standard_normal(out=self._block)
+            self._block *= self.sigma
+            self._next = 0
+        x = self.state
+        # x += θ(μ - x) + σ·N(0, 1), without temporaries
+        x *= 1.0 - self.theta
+        x += self.theta * self.mu
+        x += self._block[self._next]
+        self._next += 1
+        return x
+
+
 class ReplayBuffer:
-    """Fixed-size buffer to store experience tuples."""
+    """Fixed-size ring buffer to store experience tuples.
+
+    Every field is kept in its own preallocated array (one row per
+    experience), so adding an experience is a row assignment and sampling
+    is a single fancy-index per field, no matter how full the buffer is.
+    """
+
+    FIELDS = ("states", "actions", "rewards", "next_states", "dones")
+    SAVE_CHUNK = 2**16  # rows copied at a time by save and load
 
     def __init__(
         self,
+        state_size,
         action_size,
         seed,
         buffer_size,
@@ -283,75 +861,744 @@ class ReplayBuffer:
 
         Params
         ======
+            state_size (int): dimension of each state
+            action_size (int): dimension of each action
             seed (int): random seed
+            buffer_size (int): maximum number of experiences kept
+            batch_size (int): number of experiences in a sample
         """
         self.batch_size = batch_size
+        self.state_size = state_size
         self.action_size = action_size
         self.buffer_size = buffer_size
-        self.memory = deque(maxlen=self.buffer_size)
-        self.experience = namedtuple(
-            "Experience",
-            field_names=[
-                "states",
-                "actions",
-                "rewards",
-                "next_states",
-                "dones",
-            ],
+        self.rng = np.random.default_rng(seed)
+
+        self.states = self._allocate((buffer_size, state_size))
+        self.actions = self._allocate((buffer_size, action_size))
+        self.rewards = self._allocate((buffer_size, 1))
+        self.next_states = self._allocate((buffer_size, state_size))
+        self.dones = self._allocate((buffer_size, 1))
+
+        self.position = 0  # index of the next row to write
+        self.size = 0  # number of valid rows
+        self.rows_written = 0  # rows written since the buffer was created
+        self._saved_rows = {}  # rows_written at the last save, per directory
+
+    def _allocate(self, shape):
+        """Return a zeroed float32 column of the given shape."""
+        # np.zeros maps untouched pages lazily, so a large buffer only costs
+        # memory for the rows that are actually written
+        return np.zeros(shape, dtype=np.float32)
+
+    def _columns(self):
+        """Return the storage of every field, in experience tuple order."""
+        return (
+            self.states,
+            self.actions,
+            self.rewards,
+            self.next_states,
+            self.dones,
         )
-        self.seed = random.seed(seed)
+
+    def _write(self, rows, *fields):
+        """Write the given fields into `rows` (an index or a slice)."""
+        for column, values in zip(self._columns(), fields):
+            column[rows] = values
 
     def add(self, states, actions, rewards, next_states, dones):
         """Add a new experience to memory."""
-        e = self.experience(states, actions, rewards, next_states, dones)
-        self.memory.append(e)
+        i = self.position
+        self._write(i, states, actions, rewards, next_states, dones)
+
+        self.position = (i + 1) % self.buffer_size
+        self.size = min(self.size + 1, self.buffer_size)
+        self.rows_written += 1
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Add one experience per row of the given arrays to memory."""
+        n = len(states)
+        if n > self.buffer_size:
+            # Only the last buffer_size experiences would survive anyway
+            self.add_batch(
+                states[-self.buffer_size :],
+                actions[-self.buffer_size :],
+                rewards[-self.buffer_size :],
+                next_states[-self.buffer_size :],
+                dones[-self.buffer_size :],
+            )
+            return
+
+        # (n, 1), or (n, K, 1) for the K seeds of a StackedReplayBuffer
+        rewards = np.asarray(rewards, dtype=np.float32).reshape(
+            (n,) + tuple(self.rewards.shape[1:])
+        )
+        dones = np.asarray(dones, dtype=np.float32).reshape(
+            (n,) + tuple(self.dones.shape[1:])
+        )
+
+        # Split the write in two slices when it wraps around the end
+        start = self.position
+        first = min(n, self.buffer_size - start)
+        for dst, src in (
+            (slice(start, start + first), slice(0, first)),
+            (slice(0, n - first), slice(first, n)),
+        ):
+            if dst.stop == dst.start:
+                continue
+            self._write(
+                dst,
+                states[src],
+                actions[src],
+                rewards[src],
+                next_states[src],
+                dones[src],
+            )
+
+        self.position = (start + n) % self.buffer_size
+        self.size = min(self.size + n, self.buffer_size)
+        self.rows_written += n
 
     def sample(self):
         """Randomly sample a batch of experiences from memory."""
-        experiences = random.sample(self.memory, k=self.batch_size)
+        return self._gather(self._sample_indices(self.batch_size))
 
-        states = (
-            torch.from_numpy(
-                np.vstack([e.states for e in experiences if e is not None])
-            )
-            .float()
-            .to(device)
+    def sample_passes(self, n_passes):
+        """Randomly sample `n_passes` batches of experiences at once.
+
+        All rows are drawn and gathered in one go, and the result is split
+        into one experience tuple per pass.
+        """
+        idx = self._sample_indices(n_passes * self.batch_size)
+        fields = [f.split(self.batch_size) for f in self._gather(idx)]
+        return list(zip(*fields))
+
+    def _sample_indices(self, n):
+        """Draw `n` random row indices."""
+        return self.rng.integers(0, self.size, size=n)
+
+    def _gather(self, idx):
+        """Return the experiences stored at the rows `idx` as torch tensors."""
+        return tuple(
+            torch.from_numpy(column[idx]).to(device)
+            for column in self._columns()
         )
-        actions = (
-            torch.from_numpy(
-                np.vstack([e.actions for e in experiences if e is not None])
+
+    def __len__(self):
+        """Return the current size of internal memory."""
+        return self.size
+
+    def state_dict(self):
+        """Return the scalar state of the buffer."""
+        return {
+            "position": self.position,
+            "size": self.size,
+            "rows_written": self.rows_written,
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def load_state_dict(self, state):
+        self.position = state["position"]
+        self.size = state["size"]
+        self.rows_written = state["rows_written"]
+        self.rng.bit_generator.state = state["rng"]
+
+    def _row_arrays(self):
+        """Return the arrays holding one row per experience, by name."""
+        return dict(zip(self.FIELDS, self._columns()))
+
+    def _other_arrays(self):
+        """Return the arrays that are always saved whole, by name."""
+        return {}
+
+    def _dirty_rows(self, since):
+        """Return the rows written after rows_written was `since`."""
+        if since is None or self.rows_written - since >= self.size:
+            return np.arange(self.size)
+        count = self.rows_written - since
+        return (self.position - count + np.arange(count)) % self.buffer_size
+
+    def save(self, path):
+        """Write the arrays of the buffer as .npy files into `path`.
+
+        Only the rows written since the previous save into the same
+        directory are copied, a chunk at a time, so periodic checkpoints
+        cost time in proportion to the new experiences.
+        Returns
+        =======
+            dict: the scalar state, to be passed to `load`
+        """
+        os.makedirs(path, exist_ok=True)
+        key = os.path.abspath(path)
+        since = self._saved_rows.get(key)
+        for name, column in self._row_arrays().items():
+            filename = os.path.join(path, name + ".npy")
+            if not os.path.exists(filename):
+                since = None
+        rows = self._dirty_rows(since)
+
+        for name, column in self._row_arrays().items():
+            out = np.lib.format.open_memmap(
+                os.path.join(path, name + ".npy"),
+                mode="r+" if since is not None else "w+",
+                dtype=np.float32 if torch.is_tensor(column) else column.dtype,
+                shape=tuple(column.shape),
             )
-            .float()
-            .to(device)
+            for start in range(0, len(rows), self.SAVE_CHUNK):
+                chunk = rows[start : start + self.SAVE_CHUNK]
+                out[chunk] = take_rows(column, chunk)
+            out.flush()
+            del out
+        for name, array in self._other_arrays().items():
+            np.save(os.path.join(path, name + ".npy"), array)
+
+        self._saved_rows[key] = self.rows_written
+        return self.state_dict()
+
+    def load(self, path, state):
+        """Read a buffer written by `save` from `path`.
+
+        Params
+        ======
+            path (str): directory passed to `save`
+            state (dict): scalar state returned by `save`
+        """
+        for name, column in self._row_arrays().items():
+            saved = np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+            if saved.shape != tuple(column.shape):
+                raise ValueError(
+                    "Saved {} have shape {}, expected {}".format(
+                        name, saved.shape, tuple(column.shape)
+                    )
+                )
+            for start in range(0, len(saved), self.SAVE_CHUNK):
+                rows = slice(start, start + self.SAVE_CHUNK)
+                put_rows(column, rows, saved[rows])
+        for name, array in self._other_arrays().items():
+            array[...] = np.load(os.path.join(path, name + ".npy"))
+
+        self.load_state_dict(state)
+        self._saved_rows[os.path.abspath(path)] = self.rows_written
+
+
+def take_rows(column, rows):
+    """Return `column[rows]` as a NumPy array, for arrays and tensors."""
+    if torch.is_tensor(column):
+        rows = torch.from_numpy(rows).to(column.device)
+        return column[rows].cpu().numpy()
+    return column[rows]
+
+
+def put_rows(column, rows, values):
+    """Set `column[rows] = values`, for arrays and tensors."""
+    if torch.is_tensor(column):
+        values = torch.from_numpy(np.array(values))
+        column[rows] = values.to(column.device)
+    else:
+        column[rows] = values
+
+
+class DeviceReplayBuffer(ReplayBuffer):
+    """Replay buffer whose fields live as float32 tensors on `device`.
+
+    Sampling is an index_select on the device, with no NumPy round-trip
+    and no host-to-device copy of the minibatch.
+    """
+
+    def __init__(
+        self,
+        state_size,
+        action_size,
+        seed,
+        buffer_size,
+        batch_size,
+    ):
+        """Initialize a DeviceReplayBuffer object.
+
+        Params
+        ======
+            see ReplayBuffer
+        """
+        self.generator = torch.Generator(device=device)
+        self.generator.manual_seed(seed)
+        super().__init__(
+            state_size, action_size, seed, buffer_size, batch_size
         )
-        rewards = (
-            torch.from_numpy(
-                np.vstack([e.rewards for e in experiences if e is not None])
+
+    def _allocate(self, shape):
+        """Return a zeroed float32 tensor of the given shape on `device`."""
+        return torch.zeros(shape, dtype=torch.float32, device=device)
+
+    def _write(self, rows, *fields):
+        """Write the given fields into `rows` (an index or a slice)."""
+        for column, values in zip(self._columns(), fields):
+            target = column[rows]
+            target.copy_(
+                torch.as_tensor(values, dtype=torch.float32).view_as(target)
             )
-            .float()
-            .to(device)
+
+    def _sample_indices(self, n):
+        """Draw `n` random row indices on `device`."""
+        return torch.randint(
+            0, self.size, (n,), generator=self.generator, device=device
+        )
+
+    def _gather(self, idx):
+        """Return the experiences stored at the rows `idx`."""
+        return tuple(column.index_select(0, idx) for column in self._columns())
+
+    def state_dict(self):
+        """Return the scalar state of the buffer."""
+        state = super().state_dict()
+        state["generator"] = self.generator.get_state()
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        self.generator.set_state(state["generator"])
+
+
+class MemmapReplayBuffer(ReplayBuffer):
+    """Replay buffer stored in memory-mapped .npy files in a directory.
+
+    Every field is a float32 file, and `header.npy` holds the write cursor
+    and the fill count. Opening a directory that already holds a buffer
+    resumes it, so a restarted run starts with a warm buffer. The OS pages
+    cold experiences out instead of keeping them all in RAM.
+    """
+
+    def __init__(
+        self,
+        state_size,
+        action_size,
+        seed,
+        buffer_size,
+        batch_size,
+        path,
+    ):
+        """Initialize a MemmapReplayBuffer object.
+
+        Params
+        ======
+            path (str): directory of the buffer files, created if needed
+            see ReplayBuffer for the others
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._fields = iter(self.FIELDS)
+        super().__init__(
+            state_size, action_size, seed, buffer_size, batch_size
         )
-        next_states = (
-            torch.from_numpy(
-                np.vstack(
-                    [e.next_states for e in experiences if e is not None]
+
+        self._header = self._open("header", (2,), np.int64)
+        self.position, self.size = (int(x) for x in self._header)
+
+    def _open(self, name, shape, dtype):
+        """Open the .npy file `name`, creating it when it does not exist."""
+        filename = os.path.join(self.path, name + ".npy")
+        if not os.path.exists(filename):
+            return np.lib.format.open_memmap(
+                filename, mode="w+", dtype=dtype, shape=shape
+            )
+        array = np.lib.format.open_memmap(filename, mode="r+")
+        if array.shape != shape or array.dtype != dtype:
+            raise ValueError(
+                "{} holds a {} {} array, expected {} {}".format(
+                    filename, array.shape, array.dtype, shape, np.dtype(dtype)
                 )
             )
-            .float()
-            .to(device)
+        return array
+
+    def _allocate(self, shape):
+        """Open the file of the next field, in experience tuple order."""
+        return self._open(next(self._fields), shape, np.float32)
+
+    def add(self, states, actions, rewards, next_states, dones):
+        """Add a new experience to memory."""
+        super().add(states, actions, rewards, next_states, dones)
+        self._header[:] = (self.position, self.size)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Add one experience per row of the given arrays to memory."""
+        super().add_batch(states, actions, rewards, next_states, dones)
+        self._header[:] = (self.position, self.size)
+
+    def flush(self):
+        """Write every pending change to disk."""
+        for column in self._columns():
+            column.flush()
+        self._header.flush()
+
+    def save(self, path):
+        """Flush the buffer files, which already live in self.path.
+
+        Returns
+        =======
+            dict: the scalar state, to be passed to `load`
+        """
+        self.flush()
+        return self.state_dict()
+
+    def load(self, path, state):
+        """Restore the write cursor and fill count saved by `save`."""
+        self.load_state_dict(state)
+        self._header[:] = (self.position, self.size)
+
+
+class CompactReplayBuffer(ReplayBuffer):
+    """Replay buffer that stores every observation only once.
+
+    Experiences are written one environment step at a time, as a group of
+    `n_agents` consecutive rows. Row r holds the state, action, reward and
+    done flag of one agent, and the next state of that agent is the state
+    stored in row r + n_agents. When a step does not continue the previous
+    one (e.g. after a reset) the stored next states are kept as a terminal
+    group that is never sampled. Done and validity flags are bit-packed,
+    and observations can be stored as float16.
+    """
+
+    def __init__(
+        self,
+        state_size,
+        action_size,
+        seed,
+        buffer_size,
+        batch_size,
+        n_agents=1,
+        obs_dtype=np.float32,
+    ):
+        """Initialize a CompactReplayBuffer object.
+
+        Params
+        ======
+            n_agents (int): number of experiences added per environment step
+            obs_dtype (np.dtype): storage type of the observations
+            see ReplayBuffer for the others
+        """
+        self.batch_size = batch_size
+        self.state_size = state_size
+        self.action_size = action_size
+        self.n_agents = n_agents
+        self.n_groups = max(2, buffer_size // n_agents)
+        self.buffer_size = self.n_groups * n_agents
+        self.rng = np.random.default_rng(seed)
+
+        rows = self.buffer_size
+        self.observations = np.zeros((rows, state_size), dtype=obs_dtype)
+        self.actions = np.zeros((rows, action_size), dtype=np.float32)
+        self.rewards = np.zeros(rows, dtype=np.float32)
+        self.dones = np.zeros((rows + 7) // 8, dtype=np.uint8)
+        self.valid = np.zeros((rows + 7) // 8, dtype=np.uint8)
+
+        self.group = 0  # group holding the last stored next states
+        self.filled_groups = 0  # groups written at least once
+        self.size = 0  # number of sampleable experiences
+        self.rows_written = 0  # observation rows written since creation
+        self._pending = None  # next states stored in self.group
+        self._saved_rows = {}
+
+    def _rows(self, group):
+        return np.arange(group * self.n_agents, (group + 1) * self.n_agents)
+
+    def _store_observations(self, group, observations):
+        """Overwrite `group` with observations that can not be sampled yet."""
+        rows = self._rows(group)
+        self.size -= int(get_bits(self.valid, rows).sum())
+        set_bits(self.valid, rows, False)
+        self.observations[rows] = observations
+        self.filled_groups = min(self.filled_groups + 1, self.n_groups)
+        self.rows_written += self.n_agents
+
+    def add(self, states, actions, rewards, next_states, dones):
+        """Add a new experience to memory, only when n_agents is 1."""
+        if self.n_agents != 1:
+            raise ValueError(
+                "CompactReplayBuffer with n_agents > 1 needs whole steps, "
+                "use add_batch"
+            )
+        self.add_batch(
+            np.reshape(states, (1, -1)),
+            np.reshape(actions, (1, -1)),
+            [rewards],
+            np.reshape(next_states, (1, -1)),
+            [dones],
         )
-        dones = (
-            torch.from_numpy(
-                np.vstack(
-                    [e.dones for e in experiences if e is not None]
-                ).astype(np.uint8)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Add one environment step, one row per agent, to memory."""
+        if len(states) != self.n_agents:
+            raise ValueError(
+                "Expected {} experiences per step, got {}".format(
+                    self.n_agents, len(states)
+                )
             )
-            .float()
-            .to(device)
+        group = self.group
+        if self._pending is None or not np.array_equal(states, self._pending):
+            # Not a continuation: the pending next states become a terminal
+            # group and the states start a new one
+            if self._pending is not None:
+                group = (group + 1) % self.n_groups
+            self._store_observations(group, states)
+
+        rows = self._rows(group)
+        self.actions[rows] = actions
+        self.rewards[rows] = np.ravel(rewards)
+        set_bits(self.dones, rows, np.ravel(dones).astype(bool))
+
+        next_group = (group + 1) % self.n_groups
+        self._store_observations(next_group, next_states)
+        # Marked valid only now, as its next states are in place
+        set_bits(self.valid, rows, True)
+        self.size += self.n_agents
+        self.group = next_group
+        self._pending = np.array(next_states, copy=True)
+
+    def _sample_indices(self, n):
+        """Draw `n` random rows among the sampleable ones."""
+        limit = self.filled_groups * self.n_agents
+        idx = self.rng.integers(0, limit, size=n)
+        invalid = ~get_bits(self.valid, idx)
+        while invalid.any():
+            idx[invalid] = self.rng.integers(0, limit, size=invalid.sum())
+            invalid[invalid] = ~get_bits(self.valid, idx[invalid])
+        return idx
+
+    def _gather(self, idx):
+        """Return the experiences stored at the rows `idx` as torch tensors."""
+        next_idx = (idx + self.n_agents) % self.buffer_size
+        fields = (
+            self.observations[idx].astype(np.float32, copy=False),
+            self.actions[idx],
+            self.rewards[idx].reshape(-1, 1),
+            self.observations[next_idx].astype(np.float32, copy=False),
+            get_bits(self.dones, idx).astype(np.float32).reshape(-1, 1),
         )
+        return tuple(torch.from_numpy(f).to(device) for f in fields)
 
-        return (states, actions, rewards, next_states, dones)
+    def state_dict(self):
+        """Return the scalar state of the buffer."""
+        return {
+            "group": self.group,
+            "filled_groups": self.filled_groups,
+            "size": self.size,
+            "rows_written": self.rows_written,
+            "pending": self._pending,
+            "rng": self.rng.bit_generator.state,
+        }
 
-    def __len__(self):
-        """Return the current size of internal memory."""
-        return len(self.memory)
+    def load_state_dict(self, state):
+        self.group = state["group"]
+        self.filled_groups = state["filled_groups"]
+        self.size = state["size"]
+        self.rows_written = state["rows_written"]
+        self._pending = state["pending"]
+        self.rng.bit_generator.state = state["rng"]
+
+    def _row_arrays(self):
+        return {
+            "observations": self.observations,
+            "actions": self.actions,
+            "rewards": self.rewards,
+        }
+
+    def _other_arrays(self):
+        return {"dones": self.dones, "valid": self.valid}
+
+    def _dirty_rows(self, since):
+        """Return the rows written after rows_written was `since`."""
+        filled = self.filled_groups * self.n_agents
+        # The group of the pending next states gets its actions, rewards
+        # and dones later, so it is saved again
+        if (
+            since is None
+            or self.rows_written - since + self.n_agents >= filled
+        ):
+            return np.arange(filled)
+        count = self.rows_written - since + self.n_agents
+        end = (self.group + 1) * self.n_agents
+        return (end - count + np.arange(count)) % self.buffer_size
+
+
+def get_bits(packed, idx):
+    """Read the flags at positions `idx` of a bit-packed uint8 array."""
+    return ((packed[idx >> 3] >> (idx & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+def set_bits(packed, idx, values):
+    """Write the flags at positions `idx` of a bit-packed uint8 array."""
+    idx = np.asarray(idx)
+    byte = idx >> 3
+    mask = np.left_shift(1, idx & 7).astype(np.uint8)
+    np.bitwise_and.at(packed, byte, ~mask)
+    values = np.broadcast_to(values, idx.shape)
+    np.bitwise_or.at(packed, byte[values], mask[values])
+
+
+class SumTree:
+    """Array-backed binary sum-tree over a fixed number of priorities.
+
+    Node 1 is the root, the children of node i are 2i and 2i + 1, and the
+    leaves start at `tree_capacity`. All operations take arrays of indices
+    and walk the tree one level at a time, so a batch costs O(log n) NumPy
+    calls instead of one Python loop iteration per element.
+    """
+
+    def __init__(self, capacity):
+        """Initialize a SumTree with all priorities set to zero.
+
+        Params
+        ======
+            capacity (int): number of leaves (priorities) in the tree
+        """
+        self.capacity = capacity
+        self.depth = max(1, (capacity - 1).bit_length())
+        self.tree_capacity = 1 << self.depth
+        self.tree = np.zeros(2 * self.tree_capacity, dtype=np.float64)
+
+    def total(self):
+        """Return the sum of all priorities."""
+        return self.tree[1]
+
+    def __getitem__(self, idx):
+        """Return the priorities stored at the leaves `idx`."""
+        return self.tree[np.asarray(idx) + self.tree_capacity]
+
+    def update(self, idx, priorities):
+        """Set the priorities of the leaves `idx` and refresh their parents."""
+        nodes = np.asarray(idx, dtype=np.int64) + self.tree_capacity
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes >> 1)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def rebuild(self):
+        """Recompute every inner node from the leaves."""
+        for level in range(self.depth - 1, -1, -1):
+            lo, hi = 1 << level, 2 << level
+            self.tree[lo:hi] = self.tree[2 * lo : 2 * hi : 2]
+            self.tree[lo:hi] += self.tree[2 * lo + 1 : 2 * hi : 2]
+
+    def find(self, values):
+        """Return the leaves whose prefix-sum interval contains `values`."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            # Never descend into an empty subtree, even when rounding errors
+            # push a value past the total
+            go_right = (values >= left_sum) & (self.tree[left + 1] > 0)
+            values -= left_sum * go_right
+            nodes = left + go_right
+        return nodes - self.tree_capacity
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Replay buffer that samples experiences proportionally to priority.
+
+    Implements proportional prioritized experience replay (Schaul et al.,
+    2015) on top of a SumTree.
+    """
+
+    def __init__(
+        self,
+        state_size,
+        action_size,
+        seed,
+        buffer_size,
+        batch_size,
+        alpha=0.6,
+        beta=0.4,
+        beta_increment=1e-4,
+        epsilon=1e-6,
+    ):
+        """Initialize a PrioritizedReplayBuffer object.
+
+        Params
+        ======
+            alpha (float): prioritization exponent, 0 is uniform sampling
+            beta (float): initial importance-sampling exponent
+            beta_increment (float): amount added to beta on every sample, up to 1
+            epsilon (float): added to TD errors so no priority is zero
+        """
+        super().__init__(
+            state_size, action_size, seed, buffer_size, batch_size
+        )
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.tree = SumTree(buffer_size)
+
+    def add(self, states, actions, rewards, next_states, dones):
+        """Add a new experience to memory with the maximum priority."""
+        idx = self.position
+        super().add(states, actions, rewards, next_states, dones)
+        self.tree.update([idx], self.max_priority**self.alpha)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Add one experience per row to memory with the maximum priority."""
+        n = min(len(states), self.buffer_size)
+        idx = (self.position + np.arange(n)) % self.buffer_size
+        super().add_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(idx, self.max_priority**self.alpha)
+
+    def sample(self):
+        """Sample a batch of experiences proportionally to their priority.
+
+        Returns
+        =======
+            experiences (Tuple[torch.Tensor]): tuple of (s, a, r, s', done)
+            weights (torch.Tensor): normalized importance-sampling weights
+            idx (np.ndarray): buffer rows, to be passed to update_priorities
+        """
+        # Stratified sampling: one value in each of batch_size equal segments
+        total = self.tree.total()
+        segment = total / self.batch_size
+        values = (
+            np.arange(self.batch_size) + self.rng.random(self.batch_size)
+        ) * segment
+        idx = self.tree.find(values)
+
+        # Normalizing by the batch maximum keeps the weights <= 1 without a
+        # second tree to track the minimum priority
+        probabilities = self.tree[idx] / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        weights = torch.from_numpy(
+            weights.astype(np.float32).reshape(-1, 1)
+        ).to(device)
+        return self._gather(idx), weights, idx
+
+    def update_priorities(self, idx, td_errors):
+        """Set the priorities of the rows `idx` from their absolute TD errors."""
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update(idx, priorities**self.alpha)
+
+    def state_dict(self):
+        """Return the scalar state of the buffer."""
+        state = super().state_dict()
+        state["beta"] = self.beta
+        state["max_priority"] = self.max_priority
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        self.beta = state["beta"]
+        self.max_priority = state["max_priority"]
+
+    def _other_arrays(self):
+        # Priorities of old rows change on every pass, so they are always
+        # saved whole
+        leaves = self.tree.tree_capacity
+        return {
+            "priorities": self.tree.tree[leaves : leaves + self.buffer_size]
+        }
+
+    def load(self, path, state):
+        """Read a buffer written by `save` from `path`."""
+        super().load(path, state)
+        self.tree.rebuild()
@@ -0,0 +1,16 @@
+"""Benchmarks for the DDPG hot paths.
+
+Run every case from the repository root and compare against a baseline:
+    python -m benchmarks --output=results.json
+    python -m benchmarks --baseline=results.json
+
+Each benchmark module can also be run on its own, e.g.
+    python -m benchmarks.soft_update
+"""
+
+import timeit
+
+
+def best_time(fn, number, repeat=5):
+    """Returns the best of `repeat` runs of `number` calls, in us per call."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
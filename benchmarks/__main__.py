@@ -0,0 +1,92 @@
+"""Run the benchmark cases and compare them against a baseline.
+
+Usage:
+  benchmarks [<case>...] [options]
+  benchmarks --help
+
+Options:
+  --output=<file>     Write the results to this JSON file.
+  --baseline=<file>   Compare against results written by an earlier run.
+  --threshold=<x>     Relative slowdown reported as a regression [default: 0.10].
+  --scale=<x>         Multiplier for the number of timed calls, e.g. 0.1 for a quick run [default: 1.0].
+"""
+
+import json
+import platform
+import sys
+
+import numpy as np
+import torch
+from docopt import docopt
+
+from benchmarks.cases import CASES
+
+
+def run(cases, scale=1.0, output=None):
+    """Run the named cases, return the JSON document of a benchmark run.
+
+    When `output` is given, the document is rewritten there after every
+    case, so the results of the finished cases survive a failing one.
+    """
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "threads": torch.get_num_threads(),
+            "scale": scale,
+        },
+        "unit": "us",
+        "results": {},
+    }
+    for case in cases:
+        print(f"== {case}")
+        report["results"].update(CASES[case](scale))
+        if output is not None:
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+    return report
+
+
+def compare(results, baseline, threshold):
+    """Print every result next to its baseline, return the regressed names.
+
+    A result regresses when it is more than `threshold` (relative) slower
+    than the baseline.
+    """
+    regressions = []
+    for name, us in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {us:12.2f} us  (new)")
+            continue
+        change = us / baseline[name] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<40} {us:12.2f} us  {baseline[name]:12.2f} us  "
+            f"{change:+7.1%}{flag}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+    cases = options["<case>"] or list(CASES)
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        sys.exit(f"Unknown cases {unknown}, choose from {list(CASES)}")
+
+    report = run(cases, float(options["--scale"]), options["--output"])
+
+    baseline = {}
+    if options["--baseline"] is not None:
+        with open(options["--baseline"]) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(
+        report["results"], baseline, float(options["--threshold"])
+    )
+    if regressions:
+        sys.exit(f"{len(regressions)} benchmark(s) regressed: {regressions}")
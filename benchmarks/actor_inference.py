@@ -0,0 +1,58 @@
+"""Micro-benchmark: per-call latency of the eager Actor vs. CompiledActor.
+
+Run from the repository root:
+    python -m benchmarks.actor_inference
+"""
+
+import timeit
+
+import numpy as np
+import torch
+
+from model import Actor, CompiledActor
+
+
+def eager_predict(actor):
+    """The acting path of Agent.act_all: eval-mode Actor under no_grad."""
+
+    def predict(states):
+        with torch.no_grad():
+            return actor(torch.from_numpy(states)).numpy()
+
+    return predict
+
+
+def main(number=5000, repeat=5, batch_sizes=(1, 2, 64)):
+    actor = Actor(24, 2, seed=0).eval()
+    candidates = [("Actor", eager_predict(actor))]
+    for backend in CompiledActor.BACKENDS:
+        try:
+            candidates.append((backend, CompiledActor(actor, backend).predict))
+        except Exception as e:  # e.g. no compiler toolchain for torch.compile
+            print(f"{backend}: unavailable ({type(e).__name__})")
+
+    results = {}
+    for batch_size in batch_sizes:
+        states = np.random.randn(batch_size, 24).astype(np.float32)
+        expected = candidates[0][1](states)
+        for name, predict in candidates:
+            try:
+                assert np.allclose(predict(states), expected, atol=1e-5)
+            except Exception as e:
+                print(f"{name}: failed ({type(e).__name__})")
+                continue
+            best = min(
+                timeit.repeat(
+                    lambda: predict(states), number=number, repeat=repeat
+                )
+            )
+            results[(name, batch_size)] = best / number * 1e6
+            print(
+                f"batch {batch_size:>3} {name:>12}: "
+                f"{results[(name, batch_size)]:7.2f} us per call"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Benchmark cases run by `python -m benchmarks`.
+
+Every case takes a `scale` factor for the number of timed calls and returns
+{name: microseconds}, so that lower is always better.
+"""
+
+import importlib
+
+import numpy as np
+import torch
+
+from agent import Agent, ReplayBuffer
+from benchmarks import actor_inference, best_time, soft_update
+from stacked_agent import StackedAgent
+from train import Trainer
+
+STATE_SIZE = 24  # Tennis observation size
+ACTION_SIZE = 2
+NUM_AGENTS = 2
+
+
+def _transitions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.standard_normal((n, STATE_SIZE), dtype=np.float32),
+        rng.uniform(-1, 1, (n, ACTION_SIZE)).astype(np.float32),
+        rng.random(n, dtype=np.float32),
+        rng.standard_normal((n, STATE_SIZE), dtype=np.float32),
+        rng.random(n) < 0.01,
+    )
+
+
+def _filled_buffer(size, batch_size=128):
+    buffer = ReplayBuffer(STATE_SIZE, ACTION_SIZE, 0, size, batch_size)
+    chunk = _transitions(min(size, 2**16))
+    while len(buffer) < size:
+        buffer.add_batch(*chunk)
+    return buffer
+
+
+def replay(scale=1.0, sizes=(10**4, 10**5, 10**6)):
+    """Fill and sample a ReplayBuffer of several capacities."""
+    results = {}
+    step = _transitions(NUM_AGENTS)
+    for size in sizes:
+        buffer = _filled_buffer(size)
+        number = max(1, int(2000 * scale))
+        results[f"replay.add_batch[{size}]"] = best_time(
+            lambda: buffer.add_batch(*step), number
+        )
+        results[f"replay.sample[{size}]"] = best_time(buffer.sample, number)
+        results[f"replay.sample_passes16[{size}]"] = best_time(
+            lambda: buffer.sample_passes(16), max(1, number // 16)
+        )
+    return results
+
+
+class SyntheticEnv:
+    """Tennis-shaped stand-in for UnityEnvironment with random observations."""
+
+    brain_names = ["TennisBrain"]
+
+    class _Info:
+        pass
+
+    def __init__(self, num_agents=NUM_AGENTS, episode_length=100, seed=0):
+        self.num_agents = num_agents
+        self.episode_length = episode_length
+        self.rng = np.random.default_rng(seed)
+        self.t = 0
+
+    def _info(self):
+        info = self._Info()
+        info.vector_observations = self.rng.standard_normal(
+            (self.num_agents, STATE_SIZE), dtype=np.float32
+        )
+        info.rewards = [0.0] * self.num_agents
+        info.local_done = [self.t >= self.episode_length] * self.num_agents
+        info.agents = list(range(self.num_agents))
+        return {self.brain_names[0]: info}
+
+    def reset(self, train_mode=True):
+        self.t = 0
+        return self._info()
+
+    def step(self, actions):
+        self.t += 1
+        return self._info()
+
+
+def acting(scale=1.0):
+    """Per-agent Agent.act calls vs one batched Agent.act_all call."""
+    agent = Agent(
+        STATE_SIZE,
+        ACTION_SIZE,
+        seed=0,
+        buffer_size=1024,
+        num_agents=NUM_AGENTS,
+    )
+    states = _transitions(NUM_AGENTS)[0]
+    number = max(1, int(2000 * scale))
+
+    def single():
+        for state in states:
+            agent.act(state[np.newaxis])
+
+    return {
+        "act.single[2 agents]": best_time(single, number),
+        "act.batched[2 agents]": best_time(
+            lambda: agent.act_all(states), number
+        ),
+    }
+
+
+def learning(scale=1.0):
+    """One full learning round (learning_passes minibatch updates)."""
+    agent = Agent(STATE_SIZE, ACTION_SIZE, seed=0, buffer_size=10**5)
+    agent.replay_buffer = _filled_buffer(10**5, agent.batch_size)
+    bf16 = Agent(
+        STATE_SIZE,
+        ACTION_SIZE,
+        seed=0,
+        buffer_size=10**5,
+        mixed_precision=True,
+    )
+    bf16.replay_buffer = agent.replay_buffer
+    number = max(1, int(20 * scale))
+    return {
+        "learn.round": best_time(agent.learn_round, number, repeat=3),
+        "learn.round[bf16]": best_time(bf16.learn_round, number, repeat=3),
+        "learn.soft_update": best_time(
+            lambda: agent.soft_update(
+                agent.critic_local, agent.critic_target, agent.tau
+            ),
+            number * 100,
+        ),
+    }
+
+
+def stacked(scale=1.0, n_seeds=8):
+    """A learning round of n_seeds stacked agents vs n_seeds separate ones."""
+    size = 2**15
+    agent = Agent(STATE_SIZE, ACTION_SIZE, seed=0, buffer_size=size)
+    agent.replay_buffer = _filled_buffer(size, agent.batch_size)
+    stack = StackedAgent(
+        STATE_SIZE, ACTION_SIZE, list(range(n_seeds)), buffer_size=size
+    )
+    step = _transitions(size)
+    stack.replay_buffer.add_batch(
+        *(np.repeat(f[:, np.newaxis], n_seeds, axis=1) for f in step)
+    )
+    number = max(1, int(10 * scale))
+    return {
+        f"stacked.learn_round[{n_seeds} separate]": n_seeds
+        * best_time(agent.learn_round, number, repeat=3),
+        f"stacked.learn_round[{n_seeds} stacked]": best_time(
+            stack.learn_round, number, repeat=3
+        ),
+    }
+
+
+def episode_loop(scale=1.0):
+    """End-to-end Trainer episodes in SyntheticEnv, per environment step."""
+    torch.manual_seed(0)
+    agent = Agent(
+        STATE_SIZE,
+        ACTION_SIZE,
+        seed=0,
+        buffer_size=10**5,
+        num_agents=NUM_AGENTS,
+    )
+    env = SyntheticEnv()
+    trainer = Trainer(env, agent)
+    # Fill past batch_size so that the timed episodes also learn
+    for _ in range(3):
+        trainer.run_episode()
+    n_episodes = max(1, int(16 * scale))
+    steps = trainer.env_steps
+    seconds = best_time(trainer.run_episode, n_episodes, repeat=1) * n_episodes
+    return {"episode.env_step": seconds / (trainer.env_steps - steps)}
+
+
+def soft_update_loop(scale=1.0):
+    """Fused soft update vs the original per-parameter loop."""
+    results = soft_update.main(number=max(1, int(2000 * scale)))
+    return {f"soft_update.{name}": us for name, us in results.items()}
+
+
+def inference(scale=1.0):
+    """Eager Actor vs every CompiledActor backend."""
+    results = actor_inference.main(number=max(1, int(2000 * scale)))
+    return {
+        f"actor_inference.{name}[{batch_size}]": us
+        for (name, batch_size), us in results.items()
+    }
+
+
+def _unity_benchmark(name):
+    """Import benchmarks.`name`, or return None if unityagents is missing.
+
+    unityagents is a separate package (pip install ./python), only needed
+    by the unity_* cases.
+    """
+    try:
+        return importlib.import_module("benchmarks." + name)
+    except ModuleNotFoundError as e:
+        if e.name not in ("unityagents", "communicator_objects"):
+            raise
+        print(f"skipped, {e.name} is not installed (pip install ./python)")
+        return None
+
+
+def unity_decode_loop(scale=1.0):
+    """Bulk BrainInfo decode vs the original list-based one."""
+    unity_decode = _unity_benchmark("unity_decode")
+    if unity_decode is None:
+        return {}
+    results = unity_decode.main(number=max(1, int(200 * scale)))
+    return {
+        f"unity_decode.{name}[{n_agents}]": us
+        for (name, n_agents), us in results.items()
+    }
+
+
+def unity_encode_loop(scale=1.0):
+    """Reused step message vs the original per-agent action protos."""
+    unity_encode = _unity_benchmark("unity_encode")
+    if unity_encode is None:
+        return {}
+
+    results = unity_encode.main(number=max(1, int(200 * scale)))
+    return {
+        f"unity_encode.{name}[{n_agents}]": us
+        for (name, n_agents), us in results.items()
+    }
+
+
+def unity_step_loop(scale=1.0):
+    """UnityEnvironment.step_arrays vs step, without the simulation."""
+    unity_step = _unity_benchmark("unity_step")
+    if unity_step is None:
+        return {}
+
+    results = unity_step.main(number=max(1, int(200 * scale)))
+    return {
+        f"unity_step.{name}[{n_agents}]": us
+        for (name, n_agents), us in results.items()
+    }
+
+
+CASES = {
+    "replay": replay,
+    "acting": acting,
+    "learning": learning,
+    "stacked": stacked,
+    "episode": episode_loop,
+    "soft_update": soft_update_loop,
+    "actor_inference": inference,
+    "unity_decode": unity_decode_loop,
+    "unity_encode": unity_encode_loop,
+    "unity_step": unity_step_loop,
+}
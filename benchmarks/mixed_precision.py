@@ -0,0 +1,67 @@
+"""Convergence check: float32 vs bfloat16 mixed-precision training.
+
+Trains an Agent with and without `mixed_precision` from the same seed in
+TennisSimulator, like `python train.py --simulator [--mixed-precision]`,
+until the 100-episode average reaches stop_score, and reports the episodes,
+environment steps and wall time each took. Needs the unityagents package
+(pip install ./python). Run from the repository root:
+    python -m benchmarks.mixed_precision
+"""
+
+import logging
+import time
+
+from agent import Agent
+from train import Trainer
+from unityagents import TennisSimulator, UnityEnvironment
+
+
+def train(mixed_precision, seed=42, n_episodes=6000, stop_score=0.5):
+    """Train one agent, return its episodes, env steps, seconds and score."""
+    env = UnityEnvironment(communicator=TennisSimulator(seed=seed))
+    brain_name = env.brain_names[0]
+    env_info = env.reset(train_mode=True)[brain_name]
+    agent = Agent(
+        env_info.vector_observations.shape[1],
+        env.brains[brain_name].vector_action_space_size,
+        seed=seed,
+        num_agents=len(env_info.agents),
+        mixed_precision=mixed_precision,
+    )
+    trainer = Trainer(env, agent, brain_name)
+    start = time.perf_counter()
+    try:
+        _, avg_scores = trainer.train(
+            n_episodes=n_episodes, stop_score=stop_score, report_every=0
+        )
+    finally:
+        agent.close()
+        env.close()
+    return {
+        "episodes": trainer.episodes,
+        "env_steps": trainer.env_steps,
+        "seconds": time.perf_counter() - start,
+        "avg_score": avg_scores[-1],
+        "solved": avg_scores[-1] >= stop_score,
+    }
+
+
+def main(seed=42, n_episodes=6000, stop_score=0.5):
+    logging.getLogger("unityagents").setLevel(logging.WARNING)
+    results = {}
+    for name, mixed_precision in (("fp32", False), ("bf16", True)):
+        result = train(mixed_precision, seed, n_episodes, stop_score)
+        print(
+            "{}: {} after {episodes} episodes, {env_steps} steps, "
+            "{seconds:.0f} s\tAverage Score: {avg_score:.2f}".format(
+                name,
+                "solved" if result["solved"] else "not solved",
+                **result,
+            )
+        )
+        results[name] = result
+    return results
+
+
+if __name__ == "__main__":
+    main()
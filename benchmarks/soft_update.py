@@ -0,0 +1,56 @@
+"""Micro-benchmark: fused soft target update vs. the per-parameter loop.
+
+Run from the repository root:
+    python -m benchmarks.soft_update
+"""
+
+import timeit
+
+import torch
+
+from agent import Agent
+
+
+def loop_soft_update(local_model, target_model, tau):
+    """The original implementation, kept as the reference."""
+    for target_param, local_param in zip(
+        target_model.parameters(), local_model.parameters()
+    ):
+        target_param.data.copy_(
+            tau * local_param.data + (1.0 - tau) * target_param.data
+        )
+
+
+def main(number=2000, repeat=5):
+    agent = Agent(24, 2, seed=0, buffer_size=1024)
+    tau = agent.tau
+
+    def fused():
+        agent.soft_update(agent.critic_local, agent.critic_target, tau)
+        agent.soft_update(agent.actor_local, agent.actor_target, tau)
+
+    def loop():
+        loop_soft_update(agent.critic_local, agent.critic_target, tau)
+        loop_soft_update(agent.actor_local, agent.actor_target, tau)
+
+    # Both implementations must agree before their speed is compared
+    reference = [p.clone() for p in agent.critic_target.parameters()]
+    loop()
+    expected = [p.clone() for p in agent.critic_target.parameters()]
+    for p, r in zip(agent.critic_target.parameters(), reference):
+        p.data.copy_(r)
+    fused()
+    for p, e in zip(agent.critic_target.parameters(), expected):
+        assert torch.allclose(p, e, atol=1e-7)
+
+    results = {}
+    for name, fn in (("loop", loop), ("fused", fused)):
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[name] = best / number * 1e6
+        print(f"{name:>6}: {results[name]:8.2f} us per actor+critic update")
+    print(f"speedup: {results['loop'] / results['fused']:.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
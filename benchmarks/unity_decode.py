@@ -0,0 +1,79 @@
+"""Micro-benchmark: UnityEnvironment._get_state vs. the list-based decode.
+
+Needs the unityagents package (pip install ./python). Run from the
+repository root:
+    python -m benchmarks.unity_decode
+"""
+
+import logging
+import timeit
+
+import numpy as np
+
+from unityagents import BrainInfo, TennisSimulator, UnityEnvironment
+
+
+def list_get_state(output):
+    """The original decode of the vector fields, kept as the reference."""
+    data = {}
+    for b in output.agentInfos:
+        agent_info_list = output.agentInfos[b].value
+        data[b] = BrainInfo(
+            visual_observation=[],
+            vector_observation=np.array(
+                [x.stacked_vector_observation for x in agent_info_list]
+            ),
+            text_observations=[x.text_observation for x in agent_info_list],
+            memory=np.zeros((0, 0)),
+            reward=[x.reward for x in agent_info_list],
+            agents=[x.id for x in agent_info_list],
+            local_done=[x.done for x in agent_info_list],
+            vector_action=np.array(
+                [x.stored_vector_actions for x in agent_info_list]
+            ),
+            text_action=[x.stored_text_actions for x in agent_info_list],
+            max_reached=[x.max_step_reached for x in agent_info_list],
+        )
+    return data, output.global_done
+
+
+def main(number=200, repeat=5, agent_counts=(2, 10, 100, 1000)):
+    logging.getLogger("unityagents").setLevel(logging.WARNING)
+    results = {}
+    for n_agents in agent_counts:
+        sim = TennisSimulator(n_courts=max(1, n_agents // 2))
+        env = UnityEnvironment(communicator=sim)
+        env.reset()
+        sim.step(np.random.uniform(-1, 1, sim.actions.shape))
+        output = sim._output(np.zeros((sim.n_courts, 2)), sim.done)
+
+        # Both decodes must agree before their speed is compared
+        expected = list_get_state(output)[0][sim.BRAIN_NAME]
+        actual = env._get_state(output)[0][sim.BRAIN_NAME]
+        assert np.allclose(
+            actual.vector_observations, expected.vector_observations
+        )
+        assert np.array_equal(actual.rewards, expected.rewards)
+        assert np.array_equal(actual.local_done, expected.local_done)
+
+        calls = max(1, number * 2 // sim.n_agents)
+        for name, decode in (
+            ("lists", list_get_state),
+            ("bulk", env._get_state),
+        ):
+            best = min(
+                timeit.repeat(
+                    lambda: decode(output), number=calls, repeat=repeat
+                )
+            )
+            results[(name, sim.n_agents)] = best / calls * 1e6
+            print(
+                f"{sim.n_agents:>5} agents {name:>6}: "
+                f"{results[(name, sim.n_agents)]:9.1f} us per step"
+            )
+        env.close()
+    return results
+
+
+if __name__ == "__main__":
+    main()
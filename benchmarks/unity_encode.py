@@ -0,0 +1,84 @@
+"""Micro-benchmark: UnityEnvironment action encoding vs. the list-based one.
+
+Needs the unityagents package (pip install ./python). Run from the
+repository root:
+    python -m benchmarks.unity_encode
+"""
+
+import logging
+import timeit
+
+import numpy as np
+
+from communicator_objects import AgentActionProto, UnityInput, UnityRLInput
+from unityagents import TennisSimulator, UnityEnvironment
+
+
+def list_flatten(arr):
+    """The original UnityEnvironment._flatten, for an action array."""
+    arr = arr.tolist()
+    if isinstance(arr[0], list):
+        arr = [item for sublist in arr for item in sublist]
+    return [float(x) for x in arr]
+
+
+def list_step_input(brain_name, actions):
+    """The original encoding: one new AgentActionProto per agent."""
+    n_agents = len(actions)
+    vector_action = list_flatten(actions)
+    text_action = [""] * n_agents
+    rl_in = UnityRLInput()
+    _a_s = len(vector_action) // n_agents
+    for i in range(n_agents):
+        action = AgentActionProto(
+            vector_actions=vector_action[i * _a_s : (i + 1) * _a_s],
+            memories=[],
+            text_actions=text_action[i],
+        )
+        rl_in.agent_actions[brain_name].value.extend([action])
+        rl_in.command = 0
+    result = UnityInput()
+    result.rl_input.CopyFrom(rl_in)
+    return result
+
+
+def main(number=200, repeat=5, agent_counts=(2, 10, 100, 1000)):
+    logging.getLogger("unityagents").setLevel(logging.WARNING)
+    brain_name = TennisSimulator.BRAIN_NAME
+    rng = np.random.default_rng(0)
+    results = {}
+    for n_agents in agent_counts:
+        sim = TennisSimulator(n_courts=max(1, n_agents // 2))
+        env = UnityEnvironment(communicator=sim)
+        env.reset()
+        actions = rng.uniform(-1, 1, (sim.n_agents, sim.ACTION_SIZE))
+
+        def encode():
+            # What env.step does with the actions of a single brain
+            return env._generate_step_input(
+                {brain_name: env._flatten(actions)},
+                {brain_name: []},
+                {brain_name: [""] * sim.n_agents},
+            )
+
+        # Both encodings must send the same message
+        expected = list_step_input(brain_name, actions).SerializeToString()
+        assert encode().SerializeToString() == expected
+
+        calls = max(1, number * 2 // sim.n_agents)
+        for name, fn in (
+            ("lists", lambda: list_step_input(brain_name, actions)),
+            ("reused", encode),
+        ):
+            best = min(timeit.repeat(fn, number=calls, repeat=repeat))
+            results[(name, sim.n_agents)] = best / calls * 1e6
+            print(
+                f"{sim.n_agents:>5} agents {name:>6}: "
+                f"{results[(name, sim.n_agents)]:9.1f} us per step"
+            )
+        env.close()
+    return results
+
+
+if __name__ == "__main__":
+    main()
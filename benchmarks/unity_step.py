@@ -0,0 +1,67 @@
+"""Micro-benchmark: UnityEnvironment.step_arrays vs. step.
+
+The communicator replays one recorded TennisSimulator output, so the
+timings are the Python side of a step only: checking and encoding the
+actions, then decoding the output. Encoding and decoding are shared by
+both methods and dominate with many agents, so the ".prepare" results
+also time checking and encoding alone, where step_arrays only differs
+by its checks. Needs the unityagents package
+(pip install ./python). Run from the repository root:
+    python -m benchmarks.unity_step
+"""
+
+import logging
+import timeit
+
+import numpy as np
+
+from unityagents import TennisSimulator, UnityEnvironment
+
+
+class ReplaySimulator(TennisSimulator):
+    """TennisSimulator answering every step with the same recorded output."""
+
+    _output_cache = None
+
+    def exchange(self, inputs):
+        if inputs.rl_input.command != 0:
+            return super().exchange(inputs)
+        if self._output_cache is None:
+            self._output_cache = super().exchange(inputs)
+        return self._output_cache
+
+
+def main(number=200, repeat=5, agent_counts=(2, 10, 100, 1000)):
+    logging.getLogger("unityagents").setLevel(logging.WARNING)
+    brain_name = TennisSimulator.BRAIN_NAME
+    rng = np.random.default_rng(0)
+    results = {}
+    for n_agents in agent_counts:
+        sim = ReplaySimulator(n_courts=max(1, n_agents // 2))
+        env = UnityEnvironment(communicator=sim)
+        env.reset()
+        actions = rng.uniform(-1, 1, (sim.n_agents, sim.ACTION_SIZE))
+        action_dict = {brain_name: actions}
+
+        calls = max(5, number * 20 // sim.n_agents)
+        for name, fn in (
+            ("step", lambda: env.step(actions)),
+            ("step_arrays", lambda: env.step_arrays(action_dict)),
+            ("step.prepare", lambda: env._prepare_step(actions, None, None)),
+            (
+                "step_arrays.prepare",
+                lambda: env._prepare_step_arrays(action_dict, None),
+            ),
+        ):
+            best = min(timeit.repeat(fn, number=calls, repeat=repeat))
+            results[(name, sim.n_agents)] = best / calls * 1e6
+            print(
+                f"{sim.n_agents:>5} agents {name:>19}: "
+                f"{results[(name, sim.n_agents)]:9.1f} us per step"
+            )
+        env.close()
+    return results
+
+
+if __name__ == "__main__":
+    main()
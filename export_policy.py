@@ -0,0 +1,23 @@
+"""Convert a trained actor checkpoint into a NumpyPolicy .npz file.
+
+Usage:
+  export_policy.py [<checkpoint>] [<output>]
+  export_policy.py --help
+
+Arguments:
+  <checkpoint>  Actor state dict saved with torch.save [default: trained_models/checkpoint_actor.pth].
+  <output>      Destination .npz file [default: trained_models/actor_policy.npz].
+"""
+
+from docopt import docopt
+
+from model import export_numpy_policy, load_actor
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+    checkpoint = (
+        options["<checkpoint>"] or "trained_models/checkpoint_actor.pth"
+    )
+    output = options["<output>"] or "trained_models/actor_policy.npz"
+    export_numpy_policy(load_actor(checkpoint), output)
+    print(f"Wrote {output}")
@@ -86,3 +86,255 @@ class Critic(nn.Module):
         x = torch.cat((xs, action), dim=1)
         x = F.relu(self.fc2(x))
         return self.fc3(x)
+
+
+def fold_batchnorm(bn, linear):
+    """Return the weight and bias of `linear` applied after `bn` in eval mode.
+
+    In eval mode bn(x) = x * scale + shift, so
+    linear(bn(x)) = (W * scale) x + (W shift + b).
+    """
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    shift = bn.bias - bn.running_mean * scale
+    weight = linear.weight * scale.unsqueeze(0)
+    bias = linear.bias + linear.weight @ shift
+    return weight, bias
+
+
+class FoldedActor(nn.Module):
+    """
+    Inference-only Actor with bn1 folded into fc2.
+    Computes the same function as Actor in eval mode.
+    """
+
+    def __init__(self, actor):
+        """Build the folded model from a trained actor.
+        Params
+        ======
+            actor (Actor): model to fold, its weights are copied
+        """
+        super(FoldedActor, self).__init__()
+        self.fc1 = nn.Linear(actor.fc1.in_features, actor.fc1.out_features)
+        self.fc2 = nn.Linear(actor.fc2.in_features, actor.fc2.out_features)
+        self.fc3 = nn.Linear(actor.fc3.in_features, actor.fc3.out_features)
+        with torch.no_grad():
+            self.fc1.load_state_dict(actor.fc1.state_dict())
+            weight, bias = fold_batchnorm(actor.bn1, actor.fc2)
+            self.fc2.weight.copy_(weight)
+            self.fc2.bias.copy_(bias)
+            self.fc3.load_state_dict(actor.fc3.state_dict())
+        self.eval()
+
+    def forward(self, state):
+        """Map states -> actions."""
+        if state.dim() == 1:
+            state = torch.unsqueeze(state,0)
+        x = F.relu(self.fc1(state))
+        x = F.relu(self.fc2(x))
+        return torch.tanh(self.fc3(x))
+
+
+class CompiledActor:
+    """
+    Low-latency inference wrapper around a trained Actor.
+    The actor is folded (see FoldedActor) and compiled once; `predict` then
+    maps NumPy states to NumPy actions without autograd bookkeeping.
+    """
+
+    BACKENDS = ("torchscript", "compile", "eager")
+
+    def __init__(self, actor, backend="torchscript"):
+        """Fold and compile the actor.
+        Params
+        ======
+            actor (Actor): trained actor, it is not modified
+            backend (str): "torchscript" (scripted and frozen),
+                           "compile" (torch.compile) or "eager" (folded only)
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown backend {}, expected one of {}".format(
+                backend, ", ".join(self.BACKENDS)))
+        folded = FoldedActor(actor).to("cpu")
+        if backend == "torchscript":
+            self.model = torch.jit.freeze(torch.jit.script(folded))
+        elif backend == "compile":
+            self.model = torch.compile(folded)
+        else:
+            self.model = folded
+        self.backend = backend
+
+    def predict(self, states):
+        """Return the actions for a (n, state_size) or (state_size,) array of states."""
+        states = torch.from_numpy(np.asarray(states, dtype=np.float32))
+        with torch.inference_mode():
+            return self.model(states).numpy()
+
+
+def export_numpy_policy(actor, path):
+    """Write a trained actor to a flat .npz file for NumpyPolicy.
+    bn1 is folded into fc2 (see FoldedActor) and every weight is stored
+    transposed, as float32, so that a layer is `x @ w + b`.
+    Params
+    ======
+        actor (Actor): trained actor
+        path (str): destination .npz file
+    """
+    folded = FoldedActor(actor).cpu()
+    arrays = {}
+    for name in ("fc1", "fc2", "fc3"):
+        layer = getattr(folded, name)
+        arrays[name + "_w"] = layer.weight.detach().numpy().T.astype(np.float32)
+        arrays[name + "_b"] = layer.bias.detach().numpy().astype(np.float32)
+    np.savez(path, **arrays)
+
+
+def load_actor(path):
+    """Build an Actor from a state dict saved with torch.save, e.g. checkpoint_actor.pth.
+    The layer sizes are read from the saved weights.
+    """
+    state_dict = torch.load(path, map_location="cpu")
+    fc1_units, state_size = state_dict["fc1.weight"].shape
+    fc2_units = state_dict["fc2.weight"].shape[0]
+    action_size = state_dict["fc3.weight"].shape[0]
+    actor = Actor(state_size, action_size, fc1_units=fc1_units, fc2_units=fc2_units)
+    actor.load_state_dict(state_dict)
+    return actor.eval()
+
+
+class StackedLinear(nn.Module):
+    """
+    K independent Linear layers evaluated with one batched matmul.
+    Maps (K, batch, in_features) -> (K, batch, out_features).
+    """
+
+    def __init__(self, linears):
+        """Stack the weights of K Linear layers of the same shape.
+        Params
+        ======
+            linears (list of nn.Linear): layers to stack, their weights are copied
+        """
+        super(StackedLinear, self).__init__()
+        # Stored as (K, in, out) so that forward needs no transpose
+        self.weight = nn.Parameter(torch.stack([l.weight.detach().t() for l in linears]).contiguous())
+        self.bias = nn.Parameter(torch.stack([l.bias.detach() for l in linears]).unsqueeze(1))
+
+    def forward(self, x):
+        return torch.baddbmm(self.bias, x, self.weight)
+
+    def copy_to(self, k, linear):
+        """Copy the weights of layer k into `linear`."""
+        with torch.no_grad():
+            linear.weight.copy_(self.weight[k].t())
+            linear.bias.copy_(self.bias[k, 0])
+
+
+class StackedBatchNorm1d(nn.Module):
+    """
+    K independent BatchNorm1d layers over (K, batch, num_features) inputs.
+    Every layer normalizes with the statistics of its own batch and keeps
+    its own running statistics, exactly like nn.BatchNorm1d.
+    """
+
+    def __init__(self, bns):
+        """Stack the parameters and running statistics of K BatchNorm1d layers.
+        Params
+        ======
+            bns (list of nn.BatchNorm1d): layers to stack, their state is copied
+        """
+        super(StackedBatchNorm1d, self).__init__()
+        self.eps = bns[0].eps
+        self.momentum = bns[0].momentum
+        self.weight = nn.Parameter(torch.stack([bn.weight.detach() for bn in bns]).unsqueeze(1))
+        self.bias = nn.Parameter(torch.stack([bn.bias.detach() for bn in bns]).unsqueeze(1))
+        self.register_buffer("running_mean", torch.stack([bn.running_mean for bn in bns]).unsqueeze(1))
+        self.register_buffer("running_var", torch.stack([bn.running_var for bn in bns]).unsqueeze(1))
+        self.register_buffer("num_batches_tracked", bns[0].num_batches_tracked.clone())
+
+    def forward(self, x):
+        if self.training:
+            mean = x.mean(1, keepdim=True)
+            centered = x - mean
+            var = (centered * centered).mean(1, keepdim=True)
+            with torch.no_grad():
+                # The running variance is updated with the unbiased estimate
+                n = x.shape[1]
+                self.running_mean.lerp_(mean, self.momentum)
+                self.running_var.lerp_(var * (n / (n - 1)), self.momentum)
+                self.num_batches_tracked += 1
+        else:
+            centered, var = x - self.running_mean, self.running_var
+        return centered * torch.rsqrt(var + self.eps) * self.weight + self.bias
+
+    def copy_to(self, k, bn):
+        """Copy the parameters and running statistics of layer k into `bn`."""
+        with torch.no_grad():
+            bn.weight.copy_(self.weight[k, 0])
+            bn.bias.copy_(self.bias[k, 0])
+            bn.running_mean.copy_(self.running_mean[k, 0])
+            bn.running_var.copy_(self.running_var[k, 0])
+            bn.num_batches_tracked.copy_(self.num_batches_tracked)
+
+
+class StackedActor(nn.Module):
+    """
+    K independent Actors evaluated in one batched forward pass.
+    Seed k computes the same function as the k-th Actor it was built from.
+    """
+
+    def __init__(self, actors):
+        """Stack K Actors of the same architecture.
+        Params
+        ======
+            actors (list of Actor): networks to stack, their weights are copied
+        """
+        super(StackedActor, self).__init__()
+        self.fc1 = StackedLinear([a.fc1 for a in actors])
+        self.fc2 = StackedLinear([a.fc2 for a in actors])
+        self.fc3 = StackedLinear([a.fc3 for a in actors])
+        self.bn1 = StackedBatchNorm1d([a.bn1 for a in actors])
+
+    def forward(self, state):
+        """Map (K, batch, state_size) states -> (K, batch, action_size) actions."""
+        x = F.relu(self.fc1(state))
+        x = self.bn1(x)
+        x = F.relu(self.fc2(x))
+        return torch.tanh(self.fc3(x))
+
+    def copy_to(self, k, actor):
+        """Copy the weights of seed k into `actor`, an Actor of the same size."""
+        for name in ("fc1", "fc2", "fc3", "bn1"):
+            getattr(self, name).copy_to(k, getattr(actor, name))
+        return actor
+
+
+class StackedCritic(nn.Module):
+    """
+    K independent Critics evaluated in one batched forward pass.
+    Seed k computes the same function as the k-th Critic it was built from.
+    """
+
+    def __init__(self, critics):
+        """Stack K Critics of the same architecture.
+        Params
+        ======
+            critics (list of Critic): networks to stack, their weights are copied
+        """
+        super(StackedCritic, self).__init__()
+        self.fcs1 = StackedLinear([c.fcs1 for c in critics])
+        self.fc2 = StackedLinear([c.fc2 for c in critics])
+        self.fc3 = StackedLinear([c.fc3 for c in critics])
+        self.bn1 = StackedBatchNorm1d([c.bn1 for c in critics])
+
+    def forward(self, state, action):
+        """Map (K, batch, state_size) states and (K, batch, action_size) actions -> (K, batch, 1) Q-values."""
+        xs = F.relu(self.fcs1(state))
+        xs = self.bn1(xs)
+        x = torch.cat((xs, action), dim=2)
+        x = F.relu(self.fc2(x))
+        return self.fc3(x)
+
+    def copy_to(self, k, critic):
+        """Copy the weights of seed k into `critic`, a Critic of the same size."""
+        for name in ("fcs1", "fc2", "fc3", "bn1"):
+            getattr(self, name).copy_to(k, getattr(critic, name))
+        return critic
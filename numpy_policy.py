@@ -0,0 +1,55 @@
+"""Torch-free runtime for trained actors.
+
+Evaluates an actor exported with `model.export_numpy_policy` (or
+`python export_policy.py`) using NumPy only, so evaluation and deployment
+processes do not need to import torch.
+"""
+
+import numpy as np
+
+
+class NumpyPolicy:
+    """Deterministic DDPG policy evaluated with NumPy matrix multiplies."""
+
+    def __init__(self, fc1_w, fc1_b, fc2_w, fc2_b, fc3_w, fc3_b):
+        """Initialize the policy from its layers.
+
+        Params
+        ======
+            fcN_w (np.ndarray): (in_features, out_features) weights of layer N
+            fcN_b (np.ndarray): (out_features,) bias of layer N
+        """
+        self.layers = [
+            (np.ascontiguousarray(w, dtype=np.float32), b.astype(np.float32))
+            for w, b in ((fc1_w, fc1_b), (fc2_w, fc2_b), (fc3_w, fc3_b))
+        ]
+        self.state_size = self.layers[0][0].shape[0]
+        self.action_size = self.layers[-1][0].shape[1]
+
+    @classmethod
+    def load(cls, path):
+        """Load a policy from a .npz file written by export_numpy_policy."""
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    def act(self, states):
+        """Returns actions for the given states as per the policy.
+
+        Args:
+            states (np.ndarray): (n, state_size) or (state_size,) states.
+        Returns:
+            np.ndarray: (n, action_size) actions in [-1, 1].
+        """
+        x = np.asarray(states, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[np.newaxis]
+        (w1, b1), (w2, b2), (w3, b3) = self.layers
+        x = x @ w1
+        x += b1
+        np.maximum(x, 0, out=x)
+        x = x @ w2
+        x += b2
+        np.maximum(x, 0, out=x)
+        x = x @ w3
+        x += b3
+        return np.tanh(x, out=x)
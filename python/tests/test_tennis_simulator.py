@@ -0,0 +1,87 @@
+import numpy as np
+
+from unityagents import UnityEnvironment, TennisSimulator
+
+
+def test_initialization():
+    env = UnityEnvironment(communicator=TennisSimulator(n_courts=3))
+    brain = env.brains['TennisBrain']
+    assert env.brain_names == ['TennisBrain']
+    assert env.external_brain_names == ['TennisBrain']
+    assert brain.vector_observation_space_size == 8
+    assert brain.num_stacked_vector_observations == 3
+    assert brain.vector_action_space_size == 2
+    assert brain.vector_action_space_type == 'continuous'
+    env.close()
+    assert env.communicator.has_been_closed
+
+
+def test_reset_and_step():
+    env = UnityEnvironment(communicator=TennisSimulator(n_courts=3))
+    brain_info = env.reset()['TennisBrain']
+    assert brain_info.vector_observations.shape == (6, 24)
+    assert brain_info.agents == list(range(6))
+    # Every stacked frame of a new episode is the first observation
+    frames = brain_info.vector_observations.reshape(6, 3, 8)
+    assert np.all(frames == frames[:, -1:])
+
+    actions = np.random.uniform(-1, 1, (6, 2))
+    brain_info = env.step(actions)['TennisBrain']
+    assert brain_info.vector_observations.shape == (6, 24)
+    assert len(brain_info.rewards) == 6
+    assert len(brain_info.local_done) == 6
+    np.testing.assert_allclose(brain_info.previous_vector_actions, actions, rtol=1e-6)
+    env.close()
+
+
+def test_same_seed_same_episodes():
+    def rollout():
+        env = UnityEnvironment(communicator=TennisSimulator(n_courts=2, seed=7))
+        env.reset()
+        rng = np.random.default_rng(0)
+        observations = []
+        for _ in range(50):
+            brain_info = env.step(rng.uniform(-1, 1, (4, 2)))['TennisBrain']
+            observations.append(brain_info.vector_observations)
+        env.close()
+        return np.array(observations)
+
+    np.testing.assert_array_equal(rollout(), rollout())
+
+
+def test_episode_ends_when_ball_drops():
+    sim = TennisSimulator(n_courts=4, seed=1)
+    sim._reset_courts(np.ones(4, dtype=bool))
+    # Rackets moving away from the ball never hit it
+    actions = np.zeros((4, 2, 2))
+    actions[..., 0] = -1
+    sim.racket_x[:] = sim.mirror * -sim.half_length
+    done = np.zeros(4, dtype=bool)
+    total = np.zeros((4, 2))
+    for _ in range(40):
+        rewards, _ = sim.step(actions)
+        total += rewards
+        done |= sim.done
+        if done.all():
+            break
+    assert done.all()
+    # Only the agent on whose side the ball landed is penalized
+    assert np.all(np.sort(total, axis=1) == [[-0.01, 0.0]] * 4)
+    # Finished courts restart at the next step
+    sim.step(actions)
+    assert not sim.done.any()
+    assert np.all(sim.t == 0)
+
+
+def test_hitting_over_the_net_is_rewarded():
+    sim = TennisSimulator(n_courts=1, seed=0)
+    sim._reset_courts(np.ones(1, dtype=bool))
+    total = np.zeros(2)
+    for _ in range(300):
+        # Both agents follow the ball, in their own frame of reference
+        own = sim.frames[:, :, -1, :]
+        actions = np.stack([np.clip(2 * (own[..., 4] - own[..., 0]), -1, 1), np.zeros((1, 2))], axis=-1)
+        rewards, _ = sim.step(actions)
+        total += rewards[0]
+        assert not sim.done[0]
+    assert total.min() >= 0.1
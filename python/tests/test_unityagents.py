@@ -1,4 +1,6 @@
+import asyncio
 import json
+import threading
 import unittest.mock as mock
 import pytest
 import struct
@@ -7,6 +9,7 @@ import numpy as np
 
 from unityagents import UnityEnvironment, UnityEnvironmentException, UnityActionException, \
     BrainInfo, Curriculum
+from communicator_objects import AgentInfoProto, UnityInput, UnityRLOutput
 from .mock_communicator import MockCommunicator
 
 
@@ -118,6 +121,188 @@ def test_close(mock_communicator, mock_launcher):
     assert comm.has_been_closed
 
 
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_get_state_decodes_to_arrays(mock_communicator, mock_launcher):
+    mock_communicator.return_value = MockCommunicator(
+        discrete_action=False, visual_inputs=0)
+    env = UnityEnvironment(' ')
+    agent_infos = [
+        AgentInfoProto(stacked_vector_observation=[i, 2, 3, 4, 5, 6], reward=0.5 * i,
+                       stored_vector_actions=[i, -i], memories=[1] * i,
+                       done=(i == 1), max_step_reached=(i == 2), id=10 + i)
+        for i in range(3)]
+    output = UnityRLOutput(
+        global_done=False,
+        agentInfos={'RealFakeBrain': UnityRLOutput.ListAgentInfoProto(value=agent_infos)})
+    brain_info = env._get_state(output)[0]['RealFakeBrain']
+    env.close()
+    assert brain_info.vector_observations.dtype == np.float32
+    np.testing.assert_array_equal(brain_info.vector_observations[:, 0], [0, 1, 2])
+    np.testing.assert_array_equal(brain_info.previous_vector_actions, [[0, 0], [1, -1], [2, -2]])
+    np.testing.assert_array_equal(brain_info.rewards, [0, 0.5, 1])
+    np.testing.assert_array_equal(brain_info.local_done, [False, True, False])
+    np.testing.assert_array_equal(brain_info.max_reached, [False, False, True])
+    assert brain_info.agents == [10, 11, 12]
+    # Memories are padded with zeros, the protos are left untouched
+    np.testing.assert_array_equal(brain_info.memories, [[0, 0], [1, 0], [1, 1]])
+    assert [len(x.memories) for x in agent_infos] == [0, 1, 2]
+
+
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_get_state_rejects_mismatched_observations(mock_communicator, mock_launcher):
+    mock_communicator.return_value = MockCommunicator(
+        discrete_action=False, visual_inputs=0)
+    env = UnityEnvironment(' ')
+    agent_infos = [AgentInfoProto(stacked_vector_observation=[1] * (6 + i), id=i) for i in range(2)]
+    output = UnityRLOutput(agentInfos={'RealFakeBrain': UnityRLOutput.ListAgentInfoProto(value=agent_infos)})
+    with pytest.raises(UnityEnvironmentException):
+        env._get_state(output)
+    env.close()
+
+
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_step_encodes_array_actions(mock_communicator, mock_launcher):
+    comm = MockCommunicator(discrete_action=False, visual_inputs=0)
+    mock_communicator.return_value = comm
+    env = UnityEnvironment(' ')
+    env.reset()
+    sent = []
+    exchange = comm.exchange
+    comm.exchange = lambda inputs: sent.append(inputs.SerializeToString()) or exchange(inputs)
+    env.step(np.array([[0.5, -1.5], [2, 3], [4, 5]], dtype=np.float64), text_action='hi')
+    env.step(np.arange(6).reshape(3, 2), memory={'RealFakeBrain': np.ones((3, 4))})
+    env.step(np.zeros((3, 2)))
+    env.close()
+    messages = [UnityInput.FromString(x).rl_input.agent_actions['RealFakeBrain'].value for x in sent]
+    assert [list(a.vector_actions) for a in messages[0]] == [[0.5, -1.5], [2, 3], [4, 5]]
+    assert [a.text_actions for a in messages[0]] == ['hi'] * 3
+    assert [len(a.memories) for a in messages[0]] == [0] * 3
+    # The reused message only holds the values of the last step
+    assert [list(a.vector_actions) for a in messages[1]] == [[0, 1], [2, 3], [4, 5]]
+    assert [list(a.memories) for a in messages[1]] == [[1] * 4] * 3
+    assert [a.text_actions for a in messages[1]] == [''] * 3
+    assert [len(a.memories) for a in messages[2]] == [0] * 3
+
+
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_step_arrays(mock_communicator, mock_launcher):
+    comm = MockCommunicator(discrete_action=False, visual_inputs=0)
+    mock_communicator.return_value = comm
+    env = UnityEnvironment(' ')
+    with pytest.raises(UnityActionException):
+        env.step_arrays({'RealFakeBrain': np.zeros((3, 2))})
+    env.reset()
+    sent = []
+    exchange = comm.exchange
+    comm.exchange = lambda inputs: sent.append(inputs.SerializeToString()) or exchange(inputs)
+    env.step([0] * 6, text_action='hi')
+    brain_info = env.step_arrays({'RealFakeBrain': np.array([[1, 2], [3, 4], [5, 6]])},
+                                 memory={'RealFakeBrain': np.ones((3, 2))})['RealFakeBrain']
+    assert isinstance(brain_info, BrainInfo)
+    assert brain_info.vector_observations.shape == (3, 6)
+    actions = UnityInput.FromString(sent[-1]).rl_input.agent_actions['RealFakeBrain'].value
+    assert [list(a.vector_actions) for a in actions] == [[1, 2], [3, 4], [5, 6]]
+    assert [list(a.memories) for a in actions] == [[1, 1]] * 3
+    assert [a.text_actions for a in actions] == [''] * 3
+    for bad_action in ({'RealFakeBrain': np.zeros((3, 3))}, {'RealFakeBrain': np.zeros(6)},
+                       {'RealFakeBrain': np.zeros((2, 2))}, {'RealFakeBrain': [[0, 0]] * 3}, {},
+                       {'RealFakeBrain': np.zeros((3, 2)), 'Other': [0]}):
+        with pytest.raises(UnityActionException):
+            env.step_arrays(bad_action)
+    with pytest.raises(UnityActionException):
+        env.step_arrays({'RealFakeBrain': np.zeros((3, 2))}, memory={'RealFakeBrain': np.ones(4)})
+    # The episode ends on a -1 action of the first agent
+    env.step_arrays({'RealFakeBrain': -np.ones((3, 2))})
+    with pytest.raises(UnityActionException):
+        env.step_arrays({'RealFakeBrain': np.zeros((3, 2))})
+    env.close()
+    with pytest.raises(UnityEnvironmentException):
+        env.step_arrays({'RealFakeBrain': np.zeros((3, 2))})
+
+
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_step_async(mock_communicator, mock_launcher):
+    comm = MockCommunicator(discrete_action=False, visual_inputs=0)
+    mock_communicator.return_value = comm
+    env = UnityEnvironment(' ')
+    with pytest.raises(UnityActionException):
+        env.step_async([0] * 6)
+    env.reset()
+    with pytest.raises(UnityActionException):
+        env.step_wait()
+    calls = []
+    send, receive = comm.send, comm.receive
+    comm.send = lambda inputs: calls.append('send') or send(inputs)
+    comm.receive = lambda: calls.append('receive') or receive()
+
+    env.step_async(np.zeros((3, 2)))
+    assert calls == ['send']
+    with pytest.raises(UnityActionException):
+        env.step(np.zeros((3, 2)))
+    with pytest.raises(UnityActionException):
+        env.step_arrays({'RealFakeBrain': np.zeros((3, 2))})
+    with pytest.raises(UnityActionException):
+        env.step_async(np.zeros((3, 2)))
+    with pytest.raises(UnityActionException):
+        env.reset()
+    brain_info = env.step_wait()['RealFakeBrain']
+    assert calls == ['send', 'receive']
+    assert brain_info.vector_observations.shape == (3, 6)
+    with pytest.raises(UnityActionException):
+        env.step_wait()
+    env.step_async(-np.ones((3, 2)))
+    assert env.step_wait()['RealFakeBrain'].local_done[2]
+    assert env.global_done
+    env.close()
+
+
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_step_awaitable(mock_communicator, mock_launcher):
+    comm = MockCommunicator(discrete_action=False, visual_inputs=0)
+    mock_communicator.return_value = comm
+    env = UnityEnvironment(' ')
+    env.reset()
+    # The output only arrives once the event loop lets it, so it must not be waited for on the loop
+    release = threading.Event()
+    receive = comm.receive
+    comm.receive = lambda: release.wait(10) and receive()
+
+    async def step_while_running():
+        step = asyncio.ensure_future(env.step_awaitable(np.zeros((3, 2))))
+        await asyncio.sleep(0.01)
+        assert not step.done()
+        release.set()
+        return await step
+
+    brain_info = asyncio.run(step_while_running())['RealFakeBrain']
+    assert isinstance(brain_info, BrainInfo)
+    assert brain_info.vector_observations.shape == (3, 6)
+    assert not env.global_done
+    env.step(np.zeros((3, 2)))
+    env.close()
+
+
+@mock.patch('unityagents.UnityEnvironment.executable_launcher')
+@mock.patch('unityagents.UnityEnvironment.get_communicator')
+def test_close_waits_for_step_async(mock_communicator, mock_launcher):
+    comm = MockCommunicator(discrete_action=False, visual_inputs=0)
+    mock_communicator.return_value = comm
+    env = UnityEnvironment(' ')
+    env.reset()
+    received = []
+    receive = comm.receive
+    comm.receive = lambda: received.append(True) or receive()
+    env.step_async(np.zeros((3, 2)))
+    env.close()
+    assert received and comm.has_been_closed
+
+
 def test_curriculum():
     open_name = '%s.open' % __name__
     with mock.patch('json.load') as mock_load:
@@ -0,0 +1,81 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from unityagents import VectorUnityEnvironment, TennisSimulator, UnityActionException, BrainInfo
+from .mock_communicator import MockCommunicator
+
+
+def mock_communicator(worker_id=0, base_port=5005):
+    return MockCommunicator(discrete_action=False, visual_inputs=0)
+
+
+def test_reset_and_step():
+    env = VectorUnityEnvironment(n_envs=3, communicator_factory=partial(TennisSimulator, n_courts=2))
+    try:
+        assert env.brain_names == ['TennisBrain']
+        assert env.brains['TennisBrain'].vector_action_space_size == 2
+        brain_info = env.reset()['TennisBrain']
+        assert isinstance(brain_info, BrainInfo)
+        assert brain_info.vector_observations.shape == (12, 24)
+        # Agent id a of copy i is a * 3 + i
+        assert brain_info.agents == [0, 3, 6, 9, 1, 4, 7, 10, 2, 5, 8, 11]
+        # Copies are seeded differently
+        observations = brain_info.vector_observations.reshape(3, 4, 24)
+        assert not np.array_equal(observations[0], observations[1])
+
+        actions = np.random.uniform(-1, 1, (12, 2))
+        brain_info = env.step(actions)['TennisBrain']
+        assert brain_info.vector_observations.shape == (12, 24)
+        assert brain_info.rewards.shape == (12,)
+        assert brain_info.local_done.shape == (12,)
+        np.testing.assert_allclose(brain_info.previous_vector_actions, actions, rtol=1e-6)
+
+        env.step_async(actions)
+        with pytest.raises(UnityActionException):
+            env.step(actions)
+        assert env.step_wait()['TennisBrain'].vector_observations.shape == (12, 24)
+        with pytest.raises(UnityActionException):
+            env.step(np.zeros((11, 2)))
+        with pytest.raises(UnityActionException):
+            env.step({'Other': np.zeros((12, 2))})
+    finally:
+        env.close()
+
+
+def test_finished_copies_are_reset():
+    env = VectorUnityEnvironment(n_envs=2, communicator_factory=mock_communicator)
+    try:
+        env.reset()
+        actions = np.zeros((6, 2))
+        brain_info = env.step(actions)['RealFakeBrain']
+        np.testing.assert_array_equal(brain_info.local_done, [False, False, True] * 2)
+        assert env.terminal_infos == {}
+
+        # A -1 action of its first agent ends the episode of the mock, here of copy 1
+        actions[3] = -1
+        brain_info = env.step(actions)['RealFakeBrain']
+        np.testing.assert_array_equal(brain_info.local_done, [False, False, True, True, True, True])
+        np.testing.assert_array_equal(brain_info.rewards, [1] * 6)
+        assert list(env.terminal_infos) == [1]
+        assert env.terminal_infos[1]['RealFakeBrain'].agents == [1, 3, 5]
+        assert not env.global_done
+        # The copy can keep stepping without a reset
+        brain_info = env.step(np.zeros((6, 2)))['RealFakeBrain']
+        assert brain_info.agents == [0, 2, 4, 1, 3, 5]
+        assert env.terminal_infos == {}
+    finally:
+        env.close()
+
+
+def test_worker_errors_are_raised():
+    env = VectorUnityEnvironment(n_envs=2, communicator_factory=mock_communicator)
+    try:
+        env.reset()
+        # Wrong number of text actions, only checked by the workers
+        with pytest.raises(UnityActionException):
+            env.step(np.zeros((6, 2)), text_action=['a'] * 4)
+        env.step(np.zeros((6, 2)))
+    finally:
+        env.close()
@@ -2,3 +2,5 @@ from .environment import *
 from .brain import *
 from .exception import *
 from .curriculum import *
+from .tennis_simulator import TennisSimulator
+from .vector_environment import VectorUnityEnvironment
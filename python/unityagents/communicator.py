@@ -30,6 +30,23 @@ class Communicator(object):
         :return: The UnityOutputs generated by the Environment
         """
 
+    def send(self, inputs: UnityInput):
+        """
+        Sends an input to the Environment without waiting for its output, which `receive` returns. Together they
+        do what `exchange` does, and Python can work in between while the Environment simulates.
+        Communicators that can not split an exchange keep the input here and run the whole exchange in `receive`.
+        :param inputs: The UnityInput that needs to be sent the Environment
+        """
+        self._sent_inputs = inputs
+
+    def receive(self) -> UnityOutput:
+        """
+        Waits for the output of the input given to `send`.
+        :return: The UnityOutputs generated by the Environment
+        """
+        inputs, self._sent_inputs = self._sent_inputs, None
+        return self.exchange(inputs)
+
     def close(self):
         """
         Sends a shutdown signal to the unity environment, and closes the connection.
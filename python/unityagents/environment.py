@@ -1,3 +1,4 @@
+import asyncio
 import atexit
 import glob
 import io
@@ -6,11 +7,14 @@ import numpy as np
 import os
 import subprocess
 
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+
 from .brain import BrainInfo, BrainParameters, AllBrainInfo
 from .exception import UnityEnvironmentException, UnityActionException, UnityTimeOutException
 from .curriculum import Curriculum
 
-from communicator_objects import UnityRLInput, UnityRLOutput, AgentActionProto,\
+from communicator_objects import UnityRLInput, UnityRLOutput,\
     EnvironmentParametersProto, UnityRLInitializationInput, UnityRLInitializationOutput,\
     UnityInput, UnityOutput
 
@@ -28,7 +32,7 @@ logger = logging.getLogger("unityagents")
 class UnityEnvironment(object):
     def __init__(self, file_name=None, worker_id=0,
                  base_port=5005, curriculum=None,
-                 seed=0, docker_training=False, no_graphics=False):
+                 seed=0, docker_training=False, no_graphics=False, communicator=None):
         """
         Starts a new unity environment and establishes a connection with the environment.
         Notice: Currently communication between Unity and Python takes place over an open socket without authentication.
@@ -39,6 +43,8 @@ class UnityEnvironment(object):
         :int worker_id: Number to add to communication port (5005) [0]. Used for asynchronous agent scenarios.
         :param docker_training: Informs this class whether the process is being run within a container.
         :param no_graphics: Whether to run the Unity simulator in no-graphics mode
+        :param communicator: Communicator to use instead of connecting to a Unity environment, e.g. a
+        TennisSimulator. No Unity process is launched when it is given.
         """
 
         atexit.register(self._close)
@@ -47,11 +53,19 @@ class UnityEnvironment(object):
         self._version_ = "API-4"
         self._loaded = False    # If true, this means the environment was successfully loaded
         self.proc1 = None       # The process that is started. If None, no process was started
-        self.communicator = self.get_communicator(worker_id, base_port)
+        self._step_sent = False     # True from step_async until step_wait
+        self._receiving = None      # Future of the output of the step_awaitable running
+        self._step_executor = None  # Thread waiting for the outputs of step_awaitable
+        if communicator is not None:
+            self.communicator = communicator
+        else:
+            self.communicator = self.get_communicator(worker_id, base_port)
 
         # If the environment name is 'editor', a new environment will not be launched
         # and the communicator will directly try to connect to an existing unity environment.
-        if file_name is not None:
+        if communicator is not None:
+            logger.info("Using the {0} communicator.".format(type(communicator).__name__))
+        elif file_name is not None:
             self.executable_launcher(file_name, docker_training, no_graphics)
         else:
             logger.info("Start training by pressing the Play button in the Unity Editor.")
@@ -73,6 +87,8 @@ class UnityEnvironment(object):
                 "{1}.\nPlease go to https://github.com/Unity-Technologies/ml-agents to download the latest version "
                 "of ML-Agents.".format(self._version_, self._unity_version))
         self._n_agents = {}
+        self._step_input = None  # Step message reused from step to step, see _generate_step_input
+        self._step_extras = set()  # (brain, field) of the memories and text actions left in the step message
         self._global_done = None
         self._academy_name = aca_params.name
         self._log_path = aca_params.log_path
@@ -92,7 +108,7 @@ class UnityEnvironment(object):
                     "numStackedVectorObservations": brain_param.num_stacked_vector_observations,
                     "cameraResolutions": resolution,
                     "vectorActionSize": brain_param.vector_action_size,
-                    "vectorActionDescriptions": brain_param.vector_action_descriptions,
+                    "vectorActionDescriptions": list(brain_param.vector_action_descriptions),
                     "vectorActionSpaceType": brain_param.vector_action_space_type,
                     "vectorObservationSpaceType": brain_param.vector_observation_space_type
                 })
@@ -100,6 +116,14 @@ class UnityEnvironment(object):
                 self._external_brain_names += [brain_param.brain_name]
         self._num_brains = len(self._brain_names)
         self._num_external_brains = len(self._external_brain_names)
+        # Values per agent of the action arrays of step_arrays, and its defaults for memories and text actions
+        self._action_sizes = {
+            b: 1 if self._brains[b].vector_action_space_type == "discrete" else
+            self._brains[b].vector_action_space_size for b in self._external_brain_names}
+        self._no_memory = {b: () for b in self._external_brain_names}
+        # Shapes of the action arrays step_arrays accepts, per external brain, set when its number of agents changes
+        self._action_shapes = {}
+        self._no_text_action = {b: () for b in self._external_brain_names}
         self._resetParameters = dict(aca_params.environment_parameters.float_parameters) # TODO
         self._curriculum = Curriculum(curriculum, self._resetParameters)
         logger.info("\n'{0}' started successfully!\n{1}".format(self._academy_name, str(self)))
@@ -242,6 +266,7 @@ class UnityEnvironment(object):
         Sends a signal to reset the unity environment.
         :return: AllBrainInfo  : A Data structure corresponding to the initial reset state of the environment.
         """
+        self._check_no_pending_step()
         if config is None:
             config = self._curriculum.get_config(lesson)
         elif config != {}:
@@ -260,14 +285,7 @@ class UnityEnvironment(object):
             outputs = self.communicator.exchange(
                 self._generate_reset_input(train_mode, config)
             )
-            if outputs is None:
-                raise KeyboardInterrupt
-            rl_output = outputs.rl_output
-            s = self._get_state(rl_output)
-            self._global_done = s[1]
-            for _b in self._external_brain_names:
-                self._n_agents[_b] = len(s[0][_b].agents)
-            return s[0]
+            return self._update_state(outputs)
         else:
             raise UnityEnvironmentException("No Unity environment is loaded.")
 
@@ -280,6 +298,49 @@ class UnityEnvironment(object):
         :param text_action: Text action to send to environment for.
         :return: AllBrainInfo  : A Data structure corresponding to the new state of the environment.
         """
+        outputs = self.communicator.exchange(self._prepare_step(vector_action, memory, text_action))
+        return self._update_state(outputs)
+
+    def step_async(self, vector_action=None, memory=None, text_action=None):
+        """
+        Sends the actions like `step`, but returns as soon as they are sent: the environment simulates the next step
+        while the caller does other work, until `step_wait` collects the new state.
+        No other step or reset can be started in between.
+        :param vector_action: Agent's vector action to send to environment, as for `step`.
+        :param memory: Vector corresponding to memory used for RNNs, as for `step`.
+        :param text_action: Text action to send to environment, as for `step`.
+        """
+        self.communicator.send(self._prepare_step(vector_action, memory, text_action))
+        self._step_sent = True
+
+    def step_wait(self) -> AllBrainInfo:
+        """
+        Waits for the step started by `step_async`.
+        :return: AllBrainInfo  : A Data structure corresponding to the new state of the environment.
+        """
+        if not self._step_sent:
+            raise UnityActionException("There is no step to wait for. Start one with 'step_async()'")
+        return self._update_state(self._receive_step())
+
+    async def step_awaitable(self, vector_action=None, memory=None, text_action=None) -> AllBrainInfo:
+        """
+        Coroutine version of `step` for asyncio programs. The output of the environment is waited for on a
+        background thread, so the event loop keeps running other tasks while the environment simulates the step:
+            brain_info = await env.step_awaitable(actions)
+        """
+        self.step_async(vector_action, memory, text_action)
+        if self._step_executor is None:
+            self._step_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="unityagents-step")
+        self._receiving = self._step_executor.submit(self.communicator.receive)
+        # Shielded: a cancelled task leaves the output to step_wait instead of dropping it
+        await asyncio.shield(asyncio.wrap_future(self._receiving))
+        return self.step_wait()
+
+    def _prepare_step(self, vector_action, memory, text_action) -> UnityInput:
+        """
+        Checks the arguments of `step` and returns the step message to send.
+        """
+        self._check_no_pending_step()
         vector_action = {} if vector_action is None else vector_action
         memory = {} if memory is None else memory
         text_action = {} if text_action is None else text_action
@@ -365,17 +426,7 @@ class UnityEnvironment(object):
                         self._brains[b].vector_action_space_type,
                         str(vector_action[b])))
 
-            outputs = self.communicator.exchange(
-                self._generate_step_input(vector_action, memory, text_action)
-            )
-            if outputs is None:
-                raise KeyboardInterrupt
-            rl_output = outputs.rl_output
-            s = self._get_state(rl_output)
-            self._global_done = s[1]
-            for _b in self._external_brain_names:
-                self._n_agents[_b] = len(s[0][_b].agents)
-            return s[0]
+            return self._generate_step_input(vector_action, memory, text_action)
         elif not self._loaded:
             raise UnityEnvironmentException("No Unity environment is loaded.")
         elif self._global_done:
@@ -384,11 +435,54 @@ class UnityEnvironment(object):
             raise UnityActionException(
                 "You cannot conduct step without first calling reset. Reset the environment with 'reset()'")
 
+    def step_arrays(self, vector_action, memory=None) -> AllBrainInfo:
+        """
+        Fast path of `step` for callers whose actions are already NumPy arrays, one per external brain.
+        The layout of the brains is validated when reset (or a step) changes their number of agents, so none of the
+        conversions and checks of `step` are repeated: each array is only looked up among the shapes accepted for its
+        brain. No text actions are sent.
+        :param vector_action: Dictionary of brain name to (number of agents, action size) array, for every external
+        brain. Discrete brains take (number of agents,) or (number of agents, 1) arrays.
+        :param memory: Optional dictionary of brain name to (number of agents, memory size) array.
+        :return: AllBrainInfo  : A Data structure corresponding to the new state of the environment.
+        """
+        outputs = self.communicator.exchange(self._prepare_step_arrays(vector_action, memory))
+        return self._update_state(outputs)
+
+    def _prepare_step_arrays(self, vector_action, memory) -> UnityInput:
+        """
+        Checks the arguments of `step_arrays` against the cached layout and returns the step message to send.
+        """
+        self._check_no_pending_step()
+        if not self._loaded:
+            raise UnityEnvironmentException("No Unity environment is loaded.")
+        if self._global_done is None:
+            raise UnityActionException(
+                "You cannot conduct step without first calling reset. Reset the environment with 'reset()'")
+        if self._global_done:
+            raise UnityActionException("The episode is completed. Reset the environment with 'reset()'")
+        action_shapes = self._action_shapes
+        if vector_action.keys() != action_shapes.keys() or (memory is not None and memory.keys() - action_shapes.keys()):
+            raise UnityActionException(
+                "step_arrays needs an action array for each of the external brains {0}, and memories for "
+                "no other brain, but was given actions for {1} and memories for {2}.".format(
+                    self._external_brain_names, list(vector_action), list(memory or ())))
+        for b, accepted in action_shapes.items():
+            if getattr(vector_action[b], "shape", None) not in accepted:
+                raise UnityActionException(
+                    "The brain {0} expected a ({1}, {2}) action array, but was given {3}.".format(
+                        b, self._n_agents[b], self._action_sizes[b], self._describe_array(vector_action[b])))
+        memory = self._no_memory if memory is None else dict(self._no_memory, **memory)
+        return self._generate_step_input(vector_action, memory, self._no_text_action)
+
     def close(self):
         """
         Sends a shutdown signal to the unity environment, and closes the socket connection.
         """
         if self._loaded:
+            if self._step_sent:
+                # Let the environment finish the step before it is shut down
+                self._receive_step()
             self._close()
         else:
             raise UnityEnvironmentException("No Unity environment is loaded.")
@@ -396,20 +490,62 @@ class UnityEnvironment(object):
     def _close(self):
         self._loaded = False
         self.communicator.close()
+        if self._step_executor is not None:
+            self._step_executor.shutdown(wait=False)
+            self._step_executor = None
         if self.proc1 is not None:
             self.proc1.kill()
 
+    def _check_no_pending_step(self):
+        if self._step_sent:
+            raise UnityActionException("A step started with 'step_async()' is still running. Call 'step_wait()' first.")
+
+    def _receive_step(self) -> UnityOutput:
+        """
+        Waits for the output of the step sent by step_async, on the thread of step_awaitable if it already waits.
+        """
+        try:
+            if self._receiving is not None:
+                return self._receiving.result()
+            return self.communicator.receive()
+        finally:
+            self._step_sent = False
+            self._receiving = None
+
+    def _update_state(self, outputs) -> AllBrainInfo:
+        """
+        Decodes the output of an exchange and records the number of agents of each external brain.
+        """
+        if outputs is None:
+            raise KeyboardInterrupt
+        rl_output = outputs.rl_output
+        s = self._get_state(rl_output)
+        self._global_done = s[1]
+        for _b in self._external_brain_names:
+            n_agents = len(s[0][_b].agents)
+            if self._n_agents.get(_b) != n_agents:
+                self._n_agents[_b] = n_agents
+                size = self._action_sizes[_b]
+                self._action_shapes[_b] = {(n_agents, size)} | ({(n_agents,)} if size == 1 else set())
+        return s[0]
+
+    @staticmethod
+    def _describe_array(value):
+        shape = getattr(value, "shape", None)
+        return "a {0}".format(type(value).__name__) if shape is None else "an array of shape {0}".format(shape)
+
     @staticmethod
     def _flatten(arr):
         """
-        Converts arrays to list.
-        :param arr: numpy vector.
-        :return: flattened list.
+        Flattens the actions or memories of a brain.
+        :param arr: Scalar, (nested) list or numpy array.
+        :return: Raveled float32 array for numpy array input, otherwise a flat list of floats.
         """
         if isinstance(arr, (int, np.int_, float, np.float_)):
             arr = [float(arr)]
         if isinstance(arr, np.ndarray):
-            arr = arr.tolist()
+            # Arrays are only flattened here, _generate_step_input converts them to floats in bulk
+            return arr.astype(np.float32, copy=False).ravel()
         if len(arr) == 0:
             return arr
         if isinstance(arr[0], np.ndarray):
@@ -442,53 +578,114 @@ class UnityEnvironment(object):
         _data = {}
         global_done = output.global_done
         for b in output.agentInfos:
-            agent_info_list = output.agentInfos[b].value
+            agent_info_list = output.agentInfos[b].value[:]  # one plain list instead of indexing the container per agent
             vis_obs = []
             for i in range(self.brains[b].number_visual_observations):
                 obs = [self._process_pixels(x.visual_observations[i],
                                             self.brains[b].camera_resolutions[i]['blackAndWhite'])
                     for x in agent_info_list]
                 vis_obs += [np.array(obs)]
-            if len(agent_info_list) == 0:
-                memory_size = 0
-            else:
-                memory_size = max([len(x.memories) for x in agent_info_list])
+            memories = [x.memories for x in agent_info_list]
+            memory_size = max(map(len, memories), default=0)
             if memory_size == 0:
                 memory = np.zeros((0, 0))
+            elif all(len(m) == memory_size for m in memories):
+                memory = self._stack_repeated(memories, memory_size)
             else:
-                [x.memories.extend([0] * (memory_size - len(x.memories))) for x in agent_info_list]
-                memory = np.array([x.memories for x in agent_info_list])
+                # Agents with shorter memories are padded with zeros
+                memory = np.zeros((len(memories), memory_size), dtype=np.float32)
+                for row, m in zip(memory, memories):
+                    row[:len(m)] = m
             _data[b] = BrainInfo(
                 visual_observation=vis_obs,
-                vector_observation=np.array([x.stacked_vector_observation for x in agent_info_list]),
+                vector_observation=self._stack_repeated([x.stacked_vector_observation for x in agent_info_list]),
                 text_observations=[x.text_observation for x in agent_info_list],
                 memory=memory,
-                reward=[x.reward for x in agent_info_list],
+                reward=np.array([x.reward for x in agent_info_list], dtype=np.float32),
                 agents=[x.id for x in agent_info_list],
-                local_done=[x.done for x in agent_info_list],
-                vector_action=np.array([x.stored_vector_actions for x in agent_info_list]),
+                local_done=np.array([x.done for x in agent_info_list], dtype=bool),
+                vector_action=self._stack_repeated([x.stored_vector_actions for x in agent_info_list]),
                 text_action=[x.stored_text_actions for x in agent_info_list],
-                max_reached=[x.max_step_reached for x in agent_info_list]
+                max_reached=np.array([x.max_step_reached for x in agent_info_list], dtype=bool)
                 )
         return _data, global_done
 
-    def _generate_step_input(self, vector_action, memory, text_action) -> UnityRLInput:
-        rl_in = UnityRLInput()
+    @staticmethod
+    def _stack_repeated(fields, width=None):
+        """
+        Copies a repeated float field of every agent into one float32 matrix, in a single pass over the values.
+        :param fields: The repeated field of each agent, all of the same length.
+        :param width: Length of the fields, the length of the first one when None.
+        :return: (number of agents, width) float32 array.
+        """
+        if width is None:
+            width = len(fields[0]) if fields else 0
+        count = len(fields) * width
+        if sum(map(len, fields)) != count:
+            raise UnityEnvironmentException(
+                "Expected {0} values per agent, but the agents sent {1}.".format(
+                    width, sorted(set(map(len, fields)))))
+        # [:] copies each field to a list in one call instead of reading it value by value
+        values = chain.from_iterable([f[:] for f in fields])
+        return np.fromiter(values, dtype=np.float32, count=count).reshape(len(fields), width)
+
+    def _generate_step_input(self, vector_action, memory, text_action) -> UnityInput:
+        """
+        Fills the step message with the actions of every agent. The message and its AgentActionProtos are kept
+        from one step to the next, only their values are replaced, and protos are only added or removed when the
+        number of agents of a brain changes.
+        The communicators copy the message before sending it, so it is not changed under them.
+        """
+        if self._step_input is None:
+            self._step_input = UnityInput()
+        rl_in = self._step_input.rl_input
+        rl_in.command = 0
         for b in vector_action:
             n_agents = self._n_agents[b]
             if n_agents == 0:
+                if b in rl_in.agent_actions:
+                    del rl_in.agent_actions[b]
+                self._step_extras -= {(b, "memories"), (b, "text_actions")}
                 continue
-            _a_s = len(vector_action[b]) // n_agents
-            _m_s = len(memory[b]) // n_agents
-            for i in range(n_agents):
-                action = AgentActionProto(
-                    vector_actions=vector_action[b][i*_a_s: (i+1)*_a_s],
-                    memories=memory[b][i*_m_s: (i+1)*_m_s],
-                    text_actions=text_action[b][i]
-                )
-                rl_in.agent_actions[b].value.extend([action])
-                rl_in.command = 0
-        return self.wrap_unity_input(rl_in)
+            actions = rl_in.agent_actions[b].value
+            if len(actions) > n_agents:
+                del actions[n_agents:]
+            while len(actions) < n_agents:
+                actions.add()
+            for action, v in zip(actions, self._agent_rows(vector_action[b], n_agents)):
+                action.vector_actions[:] = v
+            # Memories and text actions are usually not used, they are only written when they are given or when the
+            # previous step left some in the message
+            if len(memory[b]) or (b, "memories") in self._step_extras:
+                for action, m in zip(actions, self._agent_rows(memory[b], n_agents)):
+                    action.memories[:] = m
+                self._mark_step_extra((b, "memories"), len(memory[b]))
+            has_text = any(text_action[b])
+            if has_text or (b, "text_actions") in self._step_extras:
+                for action, t in zip(actions, text_action[b] if len(text_action[b]) else repeat("")):
+                    action.text_actions = t
+                self._mark_step_extra((b, "text_actions"), has_text)
+        return self._step_input
+
+    def _mark_step_extra(self, key, present):
+        if present:
+            self._step_extras.add(key)
+        else:
+            self._step_extras.discard(key)
+
+    @staticmethod
+    def _agent_rows(values, n_agents):
+        """
+        Splits the flat values of a brain into one list of floats per agent.
+        :param values: Flat list or array of the values of every agent.
+        :param n_agents: Number of agents of the brain.
+        :return: List of n_agents lists, converted with a single tolist instead of float by float.
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if values.size % n_agents != 0:
+            raise UnityActionException(
+                "{0} values can not be split evenly between {1} agents.".format(values.size, n_agents))
+        return values.reshape(n_agents, -1).tolist()
 
     def _generate_reset_input(self, training, config) -> UnityRLInput:
         rl_in = UnityRLInput()
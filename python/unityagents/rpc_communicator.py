@@ -71,10 +71,17 @@ class RpcCommunicator(Communicator):
         return aca_param
 
     def exchange(self, inputs: UnityInput) -> UnityOutput:
+        self.send(inputs)
+        return self.receive()
+
+    def send(self, inputs: UnityInput):
+        # Answers the pending Exchange call of Unity, which then simulates the next step
         message = UnityMessage()
         message.header.status = 200
         message.unity_input.CopyFrom(inputs)
         self.unity_to_external.parent_conn.send(message)
+
+    def receive(self) -> UnityOutput:
         output = self.unity_to_external.parent_conn.recv()
         if output.header.status != 200:
             return None
@@ -71,10 +71,16 @@ class SocketCommunicator(Communicator):
         self._conn.send(struct.pack("I", len(message)) + message)
 
     def exchange(self, inputs: UnityInput) -> UnityOutput:
+        self.send(inputs)
+        return self.receive()
+
+    def send(self, inputs: UnityInput):
         message = UnityMessage()
         message.header.status = 200
         message.unity_input.CopyFrom(inputs)
         self._communicator_send(message.SerializeToString())
+
+    def receive(self) -> UnityOutput:
         outputs = UnityMessage()
         outputs.ParseFromString(self._communicator_receive())
         if outputs.header.status != 200:
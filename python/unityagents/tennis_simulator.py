@@ -0,0 +1,258 @@
+import logging
+
+import numpy as np
+
+from .communicator import Communicator
+from communicator_objects import UnityOutput, UnityInput, BrainParametersProto, UnityRLInitializationOutput, \
+    AgentInfoProto, UnityRLOutput
+
+logger = logging.getLogger("unityagents")
+
+
+class TennisSimulator(Communicator):
+    """
+    NumPy stand-in for the Unity Tennis environment, used in place of a Unity binary:
+
+        env = UnityEnvironment(communicator=TennisSimulator(n_courts=64))
+
+    Every court holds two rackets and a ball in a 2D side view: rackets move along their half of the court and
+    jump, the ball falls under gravity and is sent over the net when it touches a racket. Like in Tennis, an agent
+    gets a reward of +0.1 when the ball it hit crosses the net and -0.01 when the ball lands on its side or it hits
+    the ball out of the court, and the episode of the court ends when the ball touches the ground.
+    All courts are simulated together, one vectorized step per exchange. A court whose episode ended is reset at
+    the next step, like Unity agents are, so a single `reset` is needed for any number of episodes.
+
+    Each agent observes 8 variables (position and velocity of its racket and of the ball), stacked over the 3 last
+    steps, in a frame mirrored so that its own half of the court is at negative x. Its 2 continuous actions are
+    the movement towards (+1) or away from (-1) the net and jumping (above 0.5).
+    Agent ids are `2 * court + side`.
+    """
+
+    BRAIN_NAME = "TennisBrain"
+    OBSERVATION_SIZE = 8
+    NUM_STACKED = 3
+    ACTION_SIZE = 2
+
+    def __init__(self, n_courts=1, max_steps=1000, seed=0, worker_id=0, base_port=5005):
+        """
+        :int n_courts: Number of courts simulated at once, each with two agents.
+        :int max_steps: Steps after which an episode is interrupted (max_step_reached).
+        :int seed: Seed of the simulator, overridden by the seed sent by UnityEnvironment when it is not 0.
+        :int worker_id: Unused, for compatibility with the other communicators.
+        :int base_port: Unused, for compatibility with the other communicators.
+        """
+        self.n_courts = n_courts
+        self.n_agents = 2 * n_courts
+        self.max_steps = max_steps
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        # Physics, in court units and seconds
+        self.dt = 0.05
+        self.half_length = 8.0
+        self.net_height = 1.0
+        self.net_gap = 0.5  # closest a racket gets to the net
+        self.gravity = 9.81
+        self.racket_gravity = 20.0
+        self.move_speed = 8.0
+        self.jump_speed = 7.0
+        self.hit_radius = 0.8
+        self.hit_speed = (7.0, 6.0)  # (towards the opponent, upwards) ball velocity after a hit
+        self.hit_reward = 0.1
+        self.miss_penalty = -0.01
+
+        # side 0 plays at x < 0, side 1 at x > 0; `mirror` maps world x to the agent's own frame
+        self.mirror = np.array([1.0, -1.0])
+        shape = (n_courts, 2)
+        self.racket_x = np.zeros(shape)
+        self.racket_y = np.zeros(shape)
+        self.racket_vx = np.zeros(shape)
+        self.racket_vy = np.zeros(shape)
+        self.ball_x = np.zeros(n_courts)
+        self.ball_y = np.zeros(n_courts)
+        self.ball_vx = np.zeros(n_courts)
+        self.ball_vy = np.zeros(n_courts)
+        self.last_hitter = np.full(n_courts, -1)
+        self.t = np.zeros(n_courts, dtype=np.int64)
+        self.frames = np.zeros((n_courts, 2, self.NUM_STACKED, self.OBSERVATION_SIZE), dtype=np.float32)
+        self.done = np.zeros(n_courts, dtype=bool)
+        self.actions = np.zeros((n_courts, 2, self.ACTION_SIZE), dtype=np.float32)
+        self.has_been_closed = False
+
+    def initialize(self, inputs: UnityInput) -> UnityOutput:
+        seed = inputs.rl_initialization_input.seed
+        if seed:
+            self.seed = seed
+            self.rng = np.random.default_rng(seed)
+        bp = BrainParametersProto(
+            vector_observation_size=self.OBSERVATION_SIZE,
+            num_stacked_vector_observations=self.NUM_STACKED,
+            vector_action_size=self.ACTION_SIZE,
+            camera_resolutions=[],
+            vector_action_descriptions=["", ""],
+            vector_action_space_type=1,  # continuous
+            vector_observation_space_type=1,  # continuous
+            brain_name=self.BRAIN_NAME,
+            brain_type=2  # external
+        )
+        rl_init = UnityRLInitializationOutput(
+            name="TennisAcademy",
+            version="API-4",
+            log_path="",
+            brain_parameters=[bp]
+        )
+        return UnityOutput(rl_initialization_output=rl_init)
+
+    def exchange(self, inputs: UnityInput) -> UnityOutput:
+        rl_input = inputs.rl_input
+        if rl_input.command == 1:  # reset
+            self._reset_courts(np.ones(self.n_courts, dtype=bool))
+            rewards = np.zeros((self.n_courts, 2))
+            max_reached = np.zeros(self.n_courts, dtype=bool)
+        elif rl_input.command == 0:  # step
+            agent_actions = rl_input.agent_actions[self.BRAIN_NAME].value
+            if len(agent_actions) == self.n_agents:
+                self.actions[:] = np.array([a.vector_actions for a in agent_actions], dtype=np.float32).reshape(
+                    self.actions.shape)
+            else:
+                self.actions[:] = 0
+            rewards, max_reached = self.step(self.actions)
+        else:  # quit
+            return None
+        return UnityOutput(rl_output=self._output(rewards, max_reached))
+
+    def close(self):
+        self.has_been_closed = True
+
+    def step(self, actions):
+        """
+        Advances every court by one step. Courts whose episode ended at the previous step are reset instead.
+        :param actions: (n_courts, 2, 2) array of actions.
+        :return: (n_courts, 2) rewards and (n_courts,) max_step_reached flags.
+        """
+        rewards = np.zeros((self.n_courts, 2))
+        restart = self.done.copy()
+        if restart.any():
+            self._reset_courts(restart)
+        live = ~restart
+        mirror = self.mirror
+        dt = self.dt
+        actions = np.clip(actions, -1, 1)
+
+        # Rackets
+        racket_vx = mirror * actions[..., 0] * self.move_speed
+        on_ground = self.racket_y <= 0
+        jump = on_ground & (actions[..., 1] > 0.5)
+        racket_vy = np.where(jump, self.jump_speed, self.racket_vy) - self.racket_gravity * dt
+        racket_x = mirror * np.clip(mirror * (self.racket_x + racket_vx * dt), -self.half_length, -self.net_gap)
+        racket_y = self.racket_y + racket_vy * dt
+        landed = racket_y < 0
+        racket_y[landed] = 0
+        racket_vy[landed] = 0
+
+        # Ball
+        prev_x = self.ball_x
+        ball_vy = self.ball_vy - self.gravity * dt
+        ball_vx = self.ball_vx.copy()
+        ball_x = self.ball_x + ball_vx * dt
+        ball_y = self.ball_y + ball_vy * dt
+        last_hitter = self.last_hitter.copy()
+
+        # A racket touching the ball sends it towards the other side, but it can not hit it twice in a row
+        dist2 = (racket_x - ball_x[:, None]) ** 2 + (racket_y - ball_y[:, None]) ** 2
+        can_hit = (dist2 < self.hit_radius ** 2) & (last_hitter[:, None] != np.arange(2))
+        hit = can_hit.any(axis=1)
+        hitter = can_hit.argmax(axis=1)
+        ball_vx = np.where(hit, mirror[hitter] * self.hit_speed[0], ball_vx)
+        ball_vy = np.where(hit, self.hit_speed[1], ball_vy)
+        last_hitter = np.where(hit, hitter, last_hitter)
+
+        # Crossing the net: over it is a point for the hitter, into it bounces back
+        crossed = (np.sign(prev_x) != np.sign(ball_x)) & ~hit
+        over = crossed & (ball_y > self.net_height)
+        into_net = crossed & ~over
+        scorer = over & (last_hitter >= 0)
+        rewards[scorer, last_hitter[scorer]] += self.hit_reward
+        ball_x = np.where(into_net, prev_x, ball_x)
+        ball_vx = np.where(into_net, -0.3 * ball_vx, ball_vx)
+
+        # The episode ends when the ball touches the ground or leaves the court
+        out = np.abs(ball_x) > self.half_length
+        down = (ball_y <= 0) | out
+        side = (ball_x > 0).astype(np.int64)
+        loser = np.where(out & (last_hitter >= 0), last_hitter, side)
+        rewards[down, loser[down]] += self.miss_penalty
+        t = self.t + 1
+        max_reached = (t >= self.max_steps) & ~down
+
+        for name, value in (("racket_x", racket_x), ("racket_y", racket_y), ("racket_vx", racket_vx),
+                            ("racket_vy", racket_vy), ("ball_x", ball_x), ("ball_y", ball_y),
+                            ("ball_vx", ball_vx), ("ball_vy", ball_vy), ("last_hitter", last_hitter), ("t", t)):
+            getattr(self, name)[live] = value[live]
+        self.done = live & (down | max_reached)
+        rewards[~live] = 0
+        max_reached &= live
+        self._observe(live)
+        return rewards, max_reached
+
+    def observations(self):
+        """
+        :return: (n_agents, 24) stacked observations, as in BrainInfo.vector_observations.
+        """
+        return self.frames.reshape(self.n_agents, -1)
+
+    def _reset_courts(self, mask):
+        n = int(mask.sum())
+        self.racket_x[mask] = self.mirror * -self.rng.uniform(3, 7, size=(n, 2))
+        self.racket_y[mask] = 0
+        self.racket_vx[mask] = 0
+        self.racket_vy[mask] = 0
+        # The ball is dropped above a random side
+        server = self.rng.integers(0, 2, size=n)
+        self.ball_x[mask] = self.mirror[server] * -self.rng.uniform(2, 6, size=n)
+        self.ball_y[mask] = 3.0
+        self.ball_vx[mask] = 0
+        self.ball_vy[mask] = 0
+        self.last_hitter[mask] = -1
+        self.t[mask] = 0
+        self.done[mask] = False
+        self.frames[mask] = 0
+        self._observe(mask)
+        # A new episode starts with every stacked frame equal to the first observation
+        self.frames[mask] = self.frames[mask][:, :, -1:, :]
+
+    def _observe(self, mask):
+        """Push the current observation of the courts in `mask` onto their frame stacks."""
+        mirror = self.mirror
+        frame = np.stack([
+            mirror * self.racket_x, self.racket_y, mirror * self.racket_vx, self.racket_vy,
+            mirror * self.ball_x[:, None], np.broadcast_to(self.ball_y[:, None], (self.n_courts, 2)),
+            mirror * self.ball_vx[:, None], np.broadcast_to(self.ball_vy[:, None], (self.n_courts, 2)),
+        ], axis=-1)
+        frames = self.frames[mask]
+        frames[:, :, :-1] = frames[:, :, 1:]
+        frames[:, :, -1] = frame[mask]
+        self.frames[mask] = frames
+
+    def _output(self, rewards, max_reached):
+        observations = self.observations().tolist()
+        rewards = rewards.ravel().tolist()
+        dones = np.repeat(self.done, 2).tolist()
+        max_reached = np.repeat(max_reached, 2).tolist()
+        actions = self.actions.reshape(self.n_agents, -1).tolist()
+        agent_infos = [
+            AgentInfoProto(
+                stacked_vector_observation=observations[i],
+                reward=rewards[i],
+                stored_vector_actions=actions[i],
+                stored_text_actions="",
+                text_observation="",
+                memories=[],
+                done=dones[i],
+                max_step_reached=max_reached[i],
+                id=i
+            ) for i in range(self.n_agents)]
+        return UnityRLOutput(
+            global_done=False,
+            agentInfos={self.BRAIN_NAME: UnityRLOutput.ListAgentInfoProto(value=agent_infos)}
+        )
@@ -0,0 +1,356 @@
+import logging
+import multiprocessing
+import socket
+
+import numpy as np
+
+from .brain import BrainInfo, AllBrainInfo
+from .environment import UnityEnvironment
+from .exception import UnityEnvironmentException, UnityActionException
+
+logger = logging.getLogger("unityagents")
+
+
+class VectorUnityEnvironment(object):
+    def __init__(self, file_name=None, n_envs=2, worker_id=0,
+                 base_port=5005, curriculum=None,
+                 seed=0, docker_training=False, no_graphics=False, communicator_factory=None):
+        """
+        Runs n_envs copies of a Unity environment, each in its own worker process, and steps them in parallel as one
+        environment: every brain sees the agents of all the copies in one BrainInfo, in the order of the copies.
+        Agent ids are made unique across the copies: the agent `id` of copy `i` becomes `id * n_envs + i`.
+
+        A copy whose episode ends (global_done) is reset by its worker right away, so the environment never needs a
+        reset after the first one. The step that ended it returns the observations of the new episode together
+        with the rewards of the last step, and local_done set for all its agents. The last state of the finished
+        episode is kept in `terminal_infos`.
+
+        :string file_name: Name of Unity environment binary.
+        :int n_envs: Number of copies of the environment.
+        :int worker_id: First worker id to use. Copies use the next worker ids whose port is free.
+        :int base_port: Baseline port number to connect to Unity environment over. worker_id increments over this.
+        :param curriculum: Curriculum file, as for UnityEnvironment.
+        :int seed: Seed of the first copy, copy i gets seed + i.
+        :param docker_training: Informs this class whether the process is being run within a container.
+        :param no_graphics: Whether to run the Unity simulator in no-graphics mode
+        :param communicator_factory: Picklable callable creating the communicator of each copy, called in the worker
+        as communicator_factory(worker_id=..., base_port=...), e.g. functools.partial(TennisSimulator, n_courts=8).
+        No Unity process is launched and no port is allocated when it is given.
+        """
+        if n_envs < 1:
+            raise UnityEnvironmentException("A VectorUnityEnvironment needs at least one environment.")
+        self.n_envs = n_envs
+        if communicator_factory is None:
+            self.worker_ids = self._free_worker_ids(n_envs, worker_id, base_port)
+        else:
+            self.worker_ids = list(range(worker_id, worker_id + n_envs))
+        self.terminal_infos = {}
+        self._n_agents = None
+        self._waiting = False
+        self._closed = False
+
+        ctx = multiprocessing.get_context("spawn")
+        self._conns = []
+        self._processes = []
+        for i, worker in enumerate(self.worker_ids):
+            env_args = dict(file_name=file_name, worker_id=worker, base_port=base_port, curriculum=curriculum,
+                            seed=seed + i, docker_training=docker_training, no_graphics=no_graphics)
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(child_conn, env_args, communicator_factory),
+                                  name="unityagents-env-{0}".format(i), daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+        try:
+            env_params = self._receive_all()
+        except Exception:
+            self.close()
+            raise
+        (self._brains, self._brain_names, self._external_brain_names, self._academy_name,
+         self._log_path) = env_params[0]
+        logger.info("\n{0} copies of '{1}' started on worker ids {2}".format(
+            n_envs, self._academy_name, self.worker_ids))
+
+    @property
+    def logfile_path(self):
+        return self._log_path
+
+    @property
+    def brains(self):
+        return self._brains
+
+    @property
+    def global_done(self):
+        # Finished copies are reset by their worker
+        return False
+
+    @property
+    def academy_name(self):
+        return self._academy_name
+
+    @property
+    def number_brains(self):
+        return len(self._brain_names)
+
+    @property
+    def number_external_brains(self):
+        return len(self._external_brain_names)
+
+    @property
+    def brain_names(self):
+        return self._brain_names
+
+    @property
+    def external_brain_names(self):
+        return self._external_brain_names
+
+    def reset(self, train_mode=True, config=None, lesson=None) -> AllBrainInfo:
+        """
+        Resets every copy of the environment.
+        :return: AllBrainInfo  : The initial state of all the copies.
+        """
+        self._check_not_waiting()
+        for conn in self._conns:
+            conn.send(("reset", (train_mode, config, lesson)))
+        infos = [info for info, _ in self._receive_all()]
+        self._n_agents = [{b: len(info[b].agents) for b in info} for info in infos]
+        self.terminal_infos = {}
+        return self._merge(infos)
+
+    def step(self, vector_action=None, memory=None, text_action=None) -> AllBrainInfo:
+        """
+        Steps every copy of the environment in parallel.
+        :param vector_action: Actions of every agent of all the copies, in the order of the BrainInfo: an array whose
+        first dimension is the number of agents of the brain, or a dictionary of brain name to such arrays.
+        :param memory: Memories of the agents, like vector_action.
+        :param text_action: Text actions of the agents, like vector_action, or one string for all the agents.
+        :return: AllBrainInfo  : The new state of all the copies.
+        """
+        self.step_async(vector_action, memory, text_action)
+        return self.step_wait()
+
+    def step_async(self, vector_action=None, memory=None, text_action=None):
+        """
+        Sends the actions to every copy without waiting for their new states, which `step_wait` returns.
+        """
+        self._check_not_waiting()
+        if self._n_agents is None:
+            raise UnityActionException(
+                "You cannot conduct step without first calling reset. Reset the environment with 'reset()'")
+        vector_action = self._per_brain(vector_action, "vector_action")
+        memory = self._per_brain(memory, "memory")
+        text_action = self._per_brain(text_action, "text_action")
+        for b, actions in vector_action.items():
+            n_agents = sum(n.get(b, 0) for n in self._n_agents)
+            action_size = 1 if self._brains[b].vector_action_space_type == "discrete" else \
+                self._brains[b].vector_action_space_size
+            shape = np.shape(actions)
+            if not shape or shape[0] != n_agents or np.size(actions) != n_agents * action_size:
+                raise UnityActionException(
+                    "The brain {0} expected actions for {1} agents of size {2}, but was given an array of shape "
+                    "{3}.".format(b, n_agents, action_size, shape))
+        for i, conn in enumerate(self._conns):
+            conn.send(("step", (self._split(vector_action, i), self._split(memory, i), self._split(text_action, i))))
+        self._waiting = True
+
+    def step_wait(self) -> AllBrainInfo:
+        """
+        Waits for the copies stepped by `step_async`.
+        :return: AllBrainInfo  : The new state of all the copies.
+        """
+        if not self._waiting:
+            raise UnityActionException("There is no step to wait for. Start one with 'step_async()'")
+        self._waiting = False
+        results = self._receive_all()
+        self.terminal_infos = {}
+        infos = []
+        for i, (info, terminal) in enumerate(results):
+            if terminal is not None:
+                # The copy was reset: its agents finished the episode with the rewards of the terminal step
+                for b, brain_info in info.items():
+                    if b in terminal:
+                        brain_info.rewards = terminal[b].rewards
+                        brain_info.max_reached = terminal[b].max_reached
+                    brain_info.local_done = np.ones(len(brain_info.agents), dtype=bool)
+                self.terminal_infos[i] = self._merge_one(terminal, i)
+            infos.append(info)
+        self._n_agents = [{b: len(info[b].agents) for b in info} for info in infos]
+        return self._merge(infos)
+
+    def close(self):
+        """
+        Closes every copy of the environment and stops the worker processes.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._waiting:
+            try:
+                self._receive_all()
+            except Exception:
+                pass
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+        for conn, process in zip(self._conns, self._processes):
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+
+    def _check_not_waiting(self):
+        if self._closed:
+            raise UnityEnvironmentException("The environment has been closed.")
+        if self._waiting:
+            raise UnityActionException("A step started with 'step_async()' is still running. Call 'step_wait()' first.")
+
+    def _receive_all(self):
+        """
+        Receives one result from every worker, and raises the first error of a worker after all have answered.
+        """
+        results, error = [], None
+        for conn in self._conns:
+            try:
+                status, result = conn.recv()
+            except EOFError:
+                status, result = "error", UnityEnvironmentException("A worker process of the environment died.")
+            if status == "error" and error is None:
+                error = result
+            results.append(result)
+        if error is not None:
+            raise error
+        return results
+
+    def _per_brain(self, value, name):
+        if value is None:
+            return {}
+        if isinstance(value, dict):
+            for b in value:
+                if b not in self._external_brain_names:
+                    raise UnityActionException(
+                        "The name {0} does not correspond to an external brain in the environment".format(b))
+            return value
+        if len(self._external_brain_names) != 1:
+            raise UnityActionException(
+                "You have {0} external brains, you need to feed a dictionary of brain names as keys "
+                "and {1}s as values".format(len(self._external_brain_names), name))
+        return {self._external_brain_names[0]: value}
+
+    def _split(self, values, i):
+        """
+        Returns the part of the per-brain values that belongs to the agents of copy i.
+        """
+        part = {}
+        for b, value in values.items():
+            if isinstance(value, str):
+                part[b] = value
+                continue
+            start = sum(n.get(b, 0) for n in self._n_agents[:i])
+            part[b] = value[start:start + self._n_agents[i].get(b, 0)]
+        return part
+
+    def _merge_one(self, info, i) -> AllBrainInfo:
+        """
+        Returns the AllBrainInfo of copy i alone, with the agent ids of the vector environment.
+        """
+        return {b: self._concatenate([brain_info], [i]) for b, brain_info in info.items()}
+
+    def _merge(self, infos) -> AllBrainInfo:
+        return {b: self._concatenate([info[b] for info in infos], range(self.n_envs)) for b in infos[0]}
+
+    def _concatenate(self, brain_infos, indices) -> BrainInfo:
+        def stack(arrays):
+            arrays = [np.asarray(a) for a in arrays]
+            non_empty = [a for a in arrays if len(a)]
+            return np.concatenate(non_empty) if non_empty else arrays[0]
+
+        n_visual = len(brain_infos[0].visual_observations)
+        memory_size = max(x.memories.shape[1] if x.memories.ndim == 2 else 0 for x in brain_infos)
+        memories = np.zeros((0, 0))
+        if memory_size > 0:
+            memories = np.zeros((sum(len(x.agents) for x in brain_infos), memory_size), dtype=np.float32)
+            row = 0
+            for x in brain_infos:
+                if x.memories.size:
+                    memories[row:row + len(x.agents), :x.memories.shape[1]] = x.memories
+                row += len(x.agents)
+        return BrainInfo(
+            visual_observation=[stack([x.visual_observations[k] for x in brain_infos]) for k in range(n_visual)],
+            vector_observation=stack([x.vector_observations for x in brain_infos]),
+            text_observations=[t for x in brain_infos for t in x.text_observations],
+            memory=memories,
+            reward=stack([x.rewards for x in brain_infos]),
+            agents=[agent * self.n_envs + i for x, i in zip(brain_infos, indices) for agent in x.agents],
+            local_done=stack([x.local_done for x in brain_infos]),
+            vector_action=stack([x.previous_vector_actions for x in brain_infos]),
+            text_action=[t for x in brain_infos for t in x.previous_text_actions],
+            max_reached=stack([x.max_reached for x in brain_infos]))
+
+    @staticmethod
+    def _free_worker_ids(n_envs, worker_id, base_port, max_skipped=100):
+        """
+        Returns the first n_envs worker ids from worker_id on whose port (base_port + worker id) is free.
+        """
+        worker_ids = []
+        candidate = worker_id
+        while len(worker_ids) < n_envs:
+            if candidate - worker_id - len(worker_ids) > max_skipped:
+                raise UnityEnvironmentException(
+                    "Couldn't find {0} free ports from port {1} on.".format(n_envs, base_port + worker_id))
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                try:
+                    s.bind(("localhost", base_port + candidate))
+                    worker_ids.append(candidate)
+                except OSError:
+                    logger.info("Port {0} is in use, skipping worker id {1}.".format(base_port + candidate, candidate))
+            candidate += 1
+        return worker_ids
+
+
+def _worker(conn, env_args, communicator_factory):
+    """
+    Runs one copy of the environment in a worker process, following the commands received on conn. Errors are sent
+    back to the VectorUnityEnvironment, which raises them.
+    """
+    env = None
+    try:
+        if communicator_factory is not None:
+            env_args["communicator"] = communicator_factory(
+                worker_id=env_args["worker_id"], base_port=env_args["base_port"])
+        env = UnityEnvironment(**env_args)
+        conn.send(("ok", (env.brains, env.brain_names, env.external_brain_names, env.academy_name,
+                          env.logfile_path)))
+    except Exception as e:
+        conn.send(("error", e))
+        conn.close()
+        return
+
+    reset_args = (True, None, None)
+    try:
+        while True:
+            command, args = conn.recv()
+            if command == "close":
+                break
+            try:
+                if command == "reset":
+                    reset_args = args
+                    result = (env.reset(*args), None)
+                else:
+                    info, terminal = env.step(*args), None
+                    if env.global_done:
+                        terminal, info = info, env.reset(*reset_args)
+                    result = (info, terminal)
+                conn.send(("ok", result))
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                conn.send(("error", e))
+    except (KeyboardInterrupt, EOFError):
+        # Interrupted, or the VectorUnityEnvironment is gone
+        pass
+    finally:
+        env.close()
+        conn.close()
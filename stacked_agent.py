@@ -0,0 +1,293 @@
+import os
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from agent import ReplayBuffer, VectorOUNoise, device, lerp_
+from model import Actor, Critic, StackedActor, StackedCritic
+
+
+class StackedAgent:
+    """K independent DDPG agents, one per seed, trained in lockstep.
+
+    The actors and critics of all seeds are stacked (see StackedActor and
+    StackedCritic), so acting and every learning pass are one batched
+    forward/backward for all K seeds instead of K small ones. The seeds
+    share nothing else: each has its own networks, optimizer state, noise
+    processes and replay sampling, and seed k learns exactly what an
+    `Agent(seed=seeds[k])` fed the same experiences would, up to
+    floating-point rounding.
+    """
+
+    def __init__(
+        self,
+        state_size,
+        action_size,
+        seeds,
+        num_agents=2,
+        buffer_size=int(2**22),
+        batch_size=128,
+        gamma=0.99,
+        tau=1e-2,
+        lr_actor=1e-3,
+        lr_critic=1e-3,
+        learning_passes=16,
+        starting_noise_factor=1,
+        noise_decay=0.995,
+        update_every=2**4,
+    ):
+        """Stacked DDPG agents
+
+        Args:
+            state_size (int): shape of the state encoding.
+            action_size (int): number of actions in the environment.
+            seeds (list of int): one seed per stacked agent.
+            num_agents (int): agents per environment, e.g. 2 for Tennis.
+            buffer_size (int): experiences stored per seed.
+            The other arguments are the same as for `Agent` and apply to
+            every seed.
+        """
+        self.state_size = state_size
+        self.action_size = action_size
+        self.seeds = list(seeds)
+        self.n_seeds = len(self.seeds)
+        self.num_agents = num_agents
+
+        self.batch_size = batch_size
+        self.gamma = gamma
+        self.tau = tau
+        self.learning_passes = learning_passes
+        self.noise_factor = starting_noise_factor
+        self.noise_decay = noise_decay
+        self.update_every = update_every
+        self.last_episode_train = 0
+        self.experiences_seen = 0
+        self.learn_steps = 0
+
+        # Every seed starts from the weights Agent(seed=seed) would have
+        def stack(model_class, stacked_class):
+            return stacked_class(
+                [
+                    model_class(state_size, action_size, seed)
+                    for seed in self.seeds
+                ]
+            ).to(device)
+
+        self.actor_local = stack(Actor, StackedActor)
+        self.actor_target = stack(Actor, StackedActor)
+        self.critic_local = stack(Critic, StackedCritic)
+        self.critic_target = stack(Critic, StackedCritic)
+        # Adam is elementwise, so one optimizer keeps the seeds independent
+        self.actor_optimizer = optim.Adam(
+            self.actor_local.parameters(), lr=lr_actor
+        )
+        self.critic_optimizer = optim.Adam(
+            self.critic_local.parameters(), lr=lr_critic
+        )
+
+        # Inference copy of the actors used by `act_all`, kept in eval mode
+        self.actor_inference = stack(Actor, StackedActor).eval()
+        self.sync_actor()
+
+        self.replay_buffer = StackedReplayBuffer(
+            state_size, action_size, self.seeds, buffer_size, batch_size
+        )
+        # One set of noise processes per seed, seeded like the batch_noise
+        # of Agent(seed=seed)
+        self.noise = [
+            VectorOUNoise(num_agents, action_size, seed) for seed in self.seeds
+        ]
+
+    def act_all(self, states, noise=True):
+        """Returns the actions of every agent of every seed.
+
+        Args:
+            states (np.ndarray): (K, num_agents, state_size) observations,
+                                 row k from the environment of seed k.
+            noise (bool): add exploration noise, one process per agent.
+        Returns:
+            np.ndarray: (K, num_agents, action_size) actions in [-1, 1].
+        """
+        states = torch.from_numpy(np.asarray(states, dtype=np.float32))
+        with torch.no_grad():
+            actions = self.actor_inference(states.to(device)).cpu().numpy()
+        if noise:
+            for k, process in enumerate(self.noise):
+                actions[k] += self.noise_factor * process.sample()
+        return np.clip(actions, -1, 1, out=actions)
+
+    def sync_actor(self):
+        """Copy the weights of actor_local into the inference actors."""
+        self.actor_inference.load_state_dict(self.actor_local.state_dict())
+
+    def step_all(
+        self, states, actions, rewards, next_states, dones, episode_number=0
+    ):
+        """Save one lockstep environment step of every seed, then maybe learn.
+
+        Args:
+            states, actions, next_states (np.ndarray): (K, num_agents, size)
+            rewards, dones (array-like): (K, num_agents)
+            episode_number (int): current episode, drives `update_every`.
+        """
+        # Rows of the buffer hold one experience of every seed
+        self.replay_buffer.add_batch(
+            np.swapaxes(states, 0, 1),
+            np.swapaxes(actions, 0, 1),
+            np.swapaxes(rewards, 0, 1),
+            np.swapaxes(next_states, 0, 1),
+            np.swapaxes(dones, 0, 1),
+        )
+        self.experiences_seen += np.shape(states)[1]  # per seed
+        for process, seed_dones in zip(self.noise, dones):
+            process.reset(seed_dones)
+
+        if len(self.replay_buffer) > self.batch_size:
+            if (
+                episode_number % self.update_every == 0
+                and self.last_episode_train != episode_number
+            ):
+                self.learn_round()
+                self.sync_actor()
+                self.last_episode_train = episode_number
+                self.noise_factor *= self.noise_decay
+                for process in self.noise:
+                    process.reset()
+
+    def learn_round(self):
+        """Run `learning_passes` learning passes on replay samples."""
+        for experiences in self.replay_buffer.sample_passes(
+            self.learning_passes
+        ):
+            self.learn(experiences)
+
+    def learn(self, experiences):
+        """Update the networks of every seed on its own batch of experiences.
+
+        The losses are per-seed means summed over the seeds, so the
+        gradient of seed k is the one `Agent.learn` computes for it.
+
+        Params
+        ======
+            experiences (Tuple[torch.Tensor]): (K, batch_size, ...) tensors
+        """
+        states, actions, rewards, next_states, dones = experiences
+
+        # ---------------------------- update critic ---------------------------- #
+        with torch.no_grad():
+            actions_next = self.actor_target(next_states)
+            Q_targets_next = self.critic_target(next_states, actions_next)
+        Q_targets = rewards + (self.gamma * Q_targets_next * (1 - dones))
+        Q_expected = self.critic_local(states, actions)
+        critic_loss = ((Q_expected - Q_targets) ** 2).mean(dim=(1, 2)).sum()
+        self.critic_optimizer.zero_grad()
+        critic_loss.backward()
+        self.critic_optimizer.step()
+
+        # ---------------------------- update actor ---------------------------- #
+        actions_pred = self.actor_local(states)
+        Q_pred = self.critic_local(states, actions_pred)
+        actor_loss = -Q_pred.mean(dim=(1, 2)).sum()
+        self.actor_optimizer.zero_grad()
+        actor_loss.backward()
+        self.actor_optimizer.step()
+
+        # ----------------------- update target networks ----------------------- #
+        self.soft_update(self.critic_local, self.critic_target, self.tau)
+        self.soft_update(self.actor_local, self.actor_target, self.tau)
+
+        self.learn_steps += 1
+
+    def soft_update(self, local_model, target_model, tau):
+        """θ_target = τ*θ_local + (1 - τ)*θ_target, for every seed at once."""
+        lerp_(
+            [p.data for p in target_model.parameters()],
+            [p.data for p in local_model.parameters()],
+            tau,
+        )
+
+    def actor(self, k):
+        """Returns the local actor of seed index k as a standalone Actor."""
+        actor = Actor(self.state_size, self.action_size, self.seeds[k])
+        return self.actor_local.copy_to(k, actor)
+
+    def critic(self, k):
+        """Returns the local critic of seed index k as a standalone Critic."""
+        critic = Critic(self.state_size, self.action_size, self.seeds[k])
+        return self.critic_local.copy_to(k, critic)
+
+    def save_models(self, models_dir):
+        """Save every seed like Tennis.ipynb does, in models_dir/seed_<seed>.
+
+        Each directory can be loaded with
+        `Agent(..., model_state_dict_path=directory)`.
+        """
+        for k, seed in enumerate(self.seeds):
+            path = os.path.join(models_dir, f"seed_{seed}")
+            os.makedirs(path, exist_ok=True)
+            torch.save(
+                self.actor(k).state_dict(),
+                os.path.join(path, "checkpoint_actor.pth"),
+            )
+            torch.save(
+                self.critic(k).state_dict(),
+                os.path.join(path, "checkpoint_critic.pth"),
+            )
+
+
+class StackedReplayBuffer(ReplayBuffer):
+    """Replay buffer holding one experience of each of K seeds per row.
+
+    Every column is (buffer_size, K, ...), so a lockstep environment step
+    of all seeds is written with the usual `add_batch`. Each seed samples
+    its own rows with its own generator, and batches come out as
+    (K, batch_size, ...) tensors for the stacked networks.
+    """
+
+    def __init__(
+        self, state_size, action_size, seeds, buffer_size, batch_size
+    ):
+        """Initialize a StackedReplayBuffer object.
+
+        Params
+        ======
+            seeds (list of int): one seed per stacked agent
+            The other parameters are the same as for `ReplayBuffer`.
+        """
+        self.n_seeds = len(seeds)
+        super().__init__(
+            state_size, action_size, seeds[0], buffer_size, batch_size
+        )
+        self.rngs = [np.random.default_rng(seed) for seed in seeds]
+        self._seed_index = np.arange(self.n_seeds)[:, np.newaxis]
+
+    def _allocate(self, shape):
+        return super()._allocate((shape[0], self.n_seeds) + shape[1:])
+
+    def _sample_indices(self, n):
+        """Draw `n` random row indices per seed, as a (K, n) array."""
+        return np.stack(
+            [rng.integers(0, self.size, size=n) for rng in self.rngs]
+        )
+
+    def _gather(self, idx):
+        return tuple(
+            torch.from_numpy(column[idx, self._seed_index]).to(device)
+            for column in self._columns()
+        )
+
+    def sample_passes(self, n_passes):
+        idx = self._sample_indices(n_passes * self.batch_size)
+        fields = [f.split(self.batch_size, dim=1) for f in self._gather(idx)]
+        return list(zip(*fields))
+
+    def state_dict(self):
+        state = super().state_dict()
+        state["rngs"] = [rng.bit_generator.state for rng in self.rngs]
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        for rng, rng_state in zip(self.rngs, state["rngs"]):
+            rng.bit_generator.state = rng_state
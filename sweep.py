@@ -0,0 +1,253 @@
+"""Hyperparameter sweep of the MA-DDPG agent over a process pool.
+
+The grid is a JSON object mapping Agent arguments to lists of values, e.g.
+    {"lr_actor": [1e-3, 2e-4], "tau": [1e-2, 1e-3], "noise_decay": [0.995, 0.999]}
+and every combination is one trial. Each worker process owns one
+UnityEnvironment on its own port (base port 5005 + worker id).
+
+Usage:
+  sweep (<env>) (<grid>) [options]
+  sweep --simulator (<grid>) [options]
+  sweep --help
+
+Options:
+  --simulator             Run the trials in the NumPy Tennis simulator (unityagents.TennisSimulator) [default: False].
+  --workers=<n>           Number of parallel worker processes [default: 4].
+  --episodes=<n>          Maximum number of episodes per trial [default: 8000].
+  --stop-score=<x>        Stop a trial once its 100-episode average reaches this score [default: 0.5].
+  --curve=<spec>          Stop a trial early when its 100-episode average is below the curve,
+                          as episode:score milestones, e.g. 2000:0.01,5000:0.2 [default: ].
+  --samples=<n>           Run this many randomly chosen combinations, 0 for the whole grid [default: 0].
+  --seed=<n>              Agent seed, unless the grid sets one [default: 42].
+  --base-worker-id=<n>    Worker id of the first worker [default: 0].
+  --output=<file>         CSV file the results table is written to [default: sweep_results.csv].
+"""
+
+import csv
+import itertools
+import json
+import multiprocessing
+import random
+import time
+
+from docopt import docopt
+
+
+class ScoreCurve:
+    """Minimum 100-episode average score a trial must reach over time."""
+
+    def __init__(self, milestones):
+        """Initialize a ScoreCurve.
+
+        Params
+        ======
+            milestones (list of (int, float)): (episode, score) pairs, from
+                                               `episode` on the average must
+                                               be at least `score`
+        """
+        self.milestones = sorted(milestones)
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a curve from "episode:score,episode:score" text."""
+        milestones = []
+        for item in filter(None, spec.split(",")):
+            episode, score = item.split(":")
+            milestones.append((int(episode), float(score)))
+        return cls(milestones)
+
+    def behind(self, episode, avg_score):
+        """True if avg_score is below the curve at `episode`."""
+        required = None
+        for milestone, score in self.milestones:
+            if milestone > episode:
+                break
+            required = score
+        return required is not None and avg_score < required
+
+
+def grid_trials(grid, samples=0, seed=0):
+    """Expand a {name: [values]} grid into a list of {name: value} trials."""
+    names = sorted(grid)
+    trials = [
+        dict(zip(names, values))
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+    if samples:
+        trials = random.Random(seed).sample(trials, min(samples, len(trials)))
+    return trials
+
+
+_worker_id = None
+
+
+def _init_worker(worker_ids):
+    """Claim the worker id (and so the port) this process uses for good."""
+    global _worker_id
+    _worker_id = worker_ids.get()
+
+
+def run_trial(job):
+    """Train one configuration in its own environment, return a result row.
+
+    Runs in a worker process; torch, the agent and the environment are
+    only imported here.
+    """
+    from agent import Agent
+    from train import Trainer
+    from unityagents import UnityEnvironment, TennisSimulator
+
+    trial_index, config, options = job
+    config = dict(config)
+    seed = config.pop("seed", options["seed"])
+    curve = ScoreCurve(options["curve"])
+    row = {"trial": trial_index, "worker_id": _worker_id, "seed": seed}
+    row.update(config)
+
+    start = time.perf_counter()
+    env = agent = None
+    try:
+        if options["env"] is None:
+            env = UnityEnvironment(communicator=TennisSimulator(seed=seed))
+        else:
+            env = UnityEnvironment(
+                file_name=options["env"],
+                worker_id=_worker_id,
+                no_graphics=True,
+            )
+        brain_name = env.brain_names[0]
+        env_info = env.reset(train_mode=True)[brain_name]
+        agent = Agent(
+            env_info.vector_observations.shape[1],
+            env.brains[brain_name].vector_action_space_size,
+            seed=seed,
+            num_agents=len(env_info.agents),
+            **config,
+        )
+        trainer = Trainer(env, agent, brain_name)
+        stopped = []
+
+        def early_stop(trainer):
+            if curve.behind(trainer.episodes, trainer.avg_scores[-1]):
+                stopped.append(trainer.episodes)
+                return True
+            return False
+
+        trainer.train(
+            n_episodes=options["episodes"],
+            stop_score=options["stop_score"],
+            report_every=0,
+            callback=early_stop,
+        )
+        solved = trainer.avg_scores[-1] >= options["stop_score"]
+        row.update(
+            episodes=trainer.episodes,
+            env_steps=trainer.env_steps,
+            final_avg_score=trainer.avg_scores[-1],
+            best_avg_score=max(trainer.avg_scores),
+            solved_episode=trainer.episodes if solved else "",
+            stopped_early=bool(stopped),
+            error="",
+        )
+    except Exception as e:  # one failed trial must not end the sweep
+        row["error"] = "{}: {}".format(type(e).__name__, e)
+    finally:
+        if agent is not None:
+            agent.close()
+        if env is not None:
+            env.close()
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+RESULT_COLUMNS = [
+    "trial",
+    "worker_id",
+    "seed",
+    "episodes",
+    "env_steps",
+    "best_avg_score",
+    "final_avg_score",
+    "solved_episode",
+    "stopped_early",
+    "seconds",
+    "error",
+]
+
+
+def run_sweep(trials, options, workers, base_worker_id=0, output=None):
+    """Run every trial on a pool of `workers` processes.
+
+    Rows are appended to the `output` CSV as trials finish, so the table
+    of a sweep that is interrupted is kept.
+    Returns
+    ======
+        list of dict: one result row per trial, in completion order
+    """
+    ctx = multiprocessing.get_context("spawn")
+    worker_ids = ctx.Queue()
+    for worker_id in range(base_worker_id, base_worker_id + workers):
+        worker_ids.put(worker_id)
+
+    names = sorted({name for trial in trials for name in trial} - {"seed"})
+    columns = RESULT_COLUMNS[:3] + names + RESULT_COLUMNS[3:]
+    jobs = [(i, trial, options) for i, trial in enumerate(trials)]
+    rows = []
+    with ctx.Pool(workers, _init_worker, (worker_ids,)) as pool:
+        f = open(output, "w", newline="") if output else None
+        try:
+            writer = None
+            if f is not None:
+                writer = csv.DictWriter(f, columns, restval="")
+                writer.writeheader()
+            for row in pool.imap_unordered(run_trial, jobs):
+                rows.append(row)
+                print(format_row(row))
+                if writer is not None:
+                    writer.writerow(row)
+                    f.flush()
+        finally:
+            if f is not None:
+                f.close()
+    return rows
+
+
+def format_row(row):
+    if row.get("error"):
+        return "Trial {trial}\tfailed: {error}".format(**row)
+    return (
+        "Trial {trial}\tepisodes {episodes}\tbest {best_avg_score:.3f}\t"
+        "final {final_avg_score:.3f}\tstopped early {stopped_early}\t"
+        "{seconds:.0f}s".format(**row)
+    )
+
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+    with open(options["<grid>"]) as f:
+        grid = json.load(f)
+    seed = int(options["--seed"])
+    trials = grid_trials(grid, int(options["--samples"]), seed)
+    trial_options = {
+        "env": options["<env>"],
+        "episodes": int(options["--episodes"]),
+        "stop_score": float(options["--stop-score"]),
+        "curve": ScoreCurve.parse(options["--curve"]).milestones,
+        "seed": seed,
+    }
+    print(
+        "Running {} trials on {} workers".format(
+            len(trials), options["--workers"]
+        )
+    )
+    rows = run_sweep(
+        trials,
+        trial_options,
+        int(options["--workers"]),
+        int(options["--base-worker-id"]),
+        options["--output"],
+    )
+    print("\nBest trials:")
+    finished = [row for row in rows if not row.get("error")]
+    for row in sorted(finished, key=lambda r: -r["best_avg_score"])[:10]:
+        print(format_row(row), {name: row[name] for name in grid})
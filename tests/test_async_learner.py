@@ -0,0 +1,121 @@
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from agent import Agent
+
+STATE_SIZE = 8
+ACTION_SIZE = 2
+NUM_AGENTS = 2
+
+
+def _agent(**kwargs):
+    return Agent(
+        STATE_SIZE,
+        ACTION_SIZE,
+        seed=0,
+        buffer_size=1024,
+        batch_size=16,
+        learning_passes=2,
+        num_agents=NUM_AGENTS,
+        async_learning=True,
+        **kwargs
+    )
+
+
+def _fill(agent, n_steps, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n_steps):
+        states = rng.standard_normal((NUM_AGENTS, STATE_SIZE))
+        agent.step_all(
+            states,
+            rng.uniform(-1, 1, (NUM_AGENTS, ACTION_SIZE)),
+            rng.standard_normal(NUM_AGENTS),
+            rng.standard_normal((NUM_AGENTS, STATE_SIZE)),
+            np.zeros(NUM_AGENTS, dtype=bool),
+        )
+
+
+def _wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(1e-3)
+
+
+def test_learns_in_background_and_stops():
+    agent = _agent()
+    learner = agent.learner
+    assert learner._thread.is_alive()
+    # Nothing to learn from until the buffer holds more than a batch
+    time.sleep(0.05)
+    assert learner.rounds == 0
+
+    _fill(agent, 20)
+    _wait_for(lambda: learner.rounds >= 3)
+    assert agent.learn_steps >= 3 * agent.learning_passes
+
+    agent.close()
+    assert not learner._thread.is_alive()
+    assert agent.learner is None
+    rounds = learner.rounds
+    time.sleep(0.05)
+    assert learner.rounds == rounds
+
+
+def test_publishes_weights_to_inference_actor():
+    agent = _agent()
+    states = np.random.default_rng(1).standard_normal((NUM_AGENTS, STATE_SIZE))
+    before = agent.act_all(states, noise=False)
+    _fill(agent, 20)
+    _wait_for(lambda: agent.learner.rounds >= 3)
+    # Rounds and weight publication happen under the learner lock
+    with agent.learner.lock:
+        for name, value in agent.actor_local.state_dict().items():
+            assert torch.equal(
+                agent.actor_inference.state_dict()[name], value
+            ), name
+        after = agent.act_all(states, noise=False)
+        single = agent.act(states[0], noise=False)
+    agent.close()
+    assert not np.allclose(before, after)
+    np.testing.assert_allclose(single[0], after[0], rtol=1e-5, atol=1e-6)
+
+
+def test_max_update_ratio_throttles_learning():
+    agent = _agent(max_update_ratio=0.25)
+    _fill(agent, 40)
+    _wait_for(lambda: agent.update_to_data_ratio >= 0.25)
+    # Let the round that crossed the limit finish
+    with agent.learner.lock:
+        pass
+    time.sleep(0.01)
+    rounds = agent.learner.rounds
+    time.sleep(0.1)
+    assert agent.learner.rounds == rounds
+    # At most one round past the limit
+    limit = 0.25 * agent.experiences_seen + agent.learning_passes
+    assert agent.learn_steps <= limit
+
+    # New experiences let it continue
+    _fill(agent, 40, seed=1)
+    _wait_for(lambda: agent.learner.rounds > rounds)
+    agent.close()
+
+
+def test_learner_errors_reach_the_acting_thread():
+    agent = _agent()
+
+    def fail():
+        raise ValueError("boom")
+
+    agent.learn_round = fail
+    _fill(agent, 20)
+    _wait_for(lambda: agent.learner.error is not None)
+    assert not agent.learner._thread.is_alive()
+    with pytest.raises(RuntimeError) as excinfo:
+        _fill(agent, 1)
+    assert isinstance(excinfo.value.__cause__, ValueError)
+    agent.close()
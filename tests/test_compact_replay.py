@@ -0,0 +1,80 @@
+import numpy as np
+
+from agent import CompactReplayBuffer, ReplayBuffer, get_bits, set_bits
+
+STATE_SIZE = 4
+ACTION_SIZE = 2
+
+
+def _episodes(n_agents, n_steps, seed=0):
+    """Yield environment steps of short episodes, one row per agent.
+
+    Every observation is distinct, so an experience can be looked up by
+    its state. Episodes end after 1 to 5 steps and restart from a fresh
+    observation; the per-agent done flags are drawn independently.
+    """
+    rng = np.random.default_rng(seed)
+    dtype = np.float32
+    states = rng.standard_normal((n_agents, STATE_SIZE), dtype)
+    remaining = rng.integers(1, 6)
+    for _ in range(n_steps):
+        actions = rng.standard_normal((n_agents, ACTION_SIZE), dtype)
+        rewards = rng.standard_normal(n_agents, dtype)
+        next_states = rng.standard_normal((n_agents, STATE_SIZE), dtype)
+        dones = rng.random(n_agents) < 0.5
+        yield states, actions, rewards, next_states, dones
+        remaining -= 1
+        if remaining == 0:
+            states = rng.standard_normal((n_agents, STATE_SIZE), dtype)
+            remaining = rng.integers(1, 6)
+        else:
+            states = next_states
+
+
+def _by_state(*fields):
+    """Index the experiences given as (s, a, r, s', done) arrays by state."""
+    return {
+        tuple(row[0]): tuple(tuple(f) for f in row[1:])
+        for row in zip(*(np.reshape(f, (len(fields[0]), -1)) for f in fields))
+    }
+
+
+def test_bits_roundtrip():
+    rng = np.random.default_rng(0)
+    flags = rng.random(37) < 0.5
+    packed = np.zeros((len(flags) + 7) // 8, dtype=np.uint8)
+    idx = rng.permutation(len(flags))
+    set_bits(packed, idx, flags[idx])
+    np.testing.assert_array_equal(get_bits(packed, np.arange(37)), flags)
+    set_bits(packed, idx[:5], False)
+    flags[idx[:5]] = False
+    np.testing.assert_array_equal(get_bits(packed, np.arange(37)), flags)
+
+
+def test_samples_match_plain_buffer_after_wraparound():
+    n_agents, buffer_size = 3, 40
+    compact = CompactReplayBuffer(
+        STATE_SIZE, ACTION_SIZE, 0, buffer_size, 64, n_agents
+    )
+    plain = ReplayBuffer(STATE_SIZE, ACTION_SIZE, 0, buffer_size, 64)
+    added = []
+    for step in _episodes(n_agents, 200):
+        compact.add_batch(*step)
+        plain.add_batch(*step)
+        added.extend(step[0])
+    assert compact.rows_written > 2 * compact.buffer_size
+
+    expected = _by_state(
+        *(column[: plain.size] for column in plain._columns())
+    )
+    sampled = {}
+    for _ in range(50):
+        experiences = [e.cpu().numpy() for e in compact.sample()]
+        sampled.update(_by_state(*experiences))
+    for state, experience in sampled.items():
+        assert experience == expected[state]
+    # Every experience whose rows survived the wraparound is sampled, and
+    # nothing older
+    assert sorted(sampled) == sorted(
+        tuple(state) for state in added[-compact.size :]
+    )
@@ -0,0 +1,55 @@
+import numpy as np
+import torch
+
+from agent import DeviceReplayBuffer, ReplayBuffer
+
+STATE_SIZE = 3
+ACTION_SIZE = 2
+
+
+def _batches(sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        yield (
+            rng.standard_normal((n, STATE_SIZE)),
+            rng.standard_normal((n, ACTION_SIZE)),
+            rng.standard_normal(n),
+            rng.standard_normal((n, STATE_SIZE)),
+            rng.random(n) < 0.5,
+        )
+
+
+def test_add_batch_matches_replay_buffer_across_wraparound():
+    buffer_size = 10
+    device_buffer = DeviceReplayBuffer(
+        STATE_SIZE, ACTION_SIZE, 0, buffer_size, 4
+    )
+    buffer = ReplayBuffer(STATE_SIZE, ACTION_SIZE, 0, buffer_size, 4)
+    # Wraps around mid-batch, and one batch is larger than the buffer
+    for batch in _batches([3, 4, 6, 1, 13, 7, 2]):
+        device_buffer.add_batch(*batch)
+        buffer.add_batch(*batch)
+        assert (device_buffer.position, device_buffer.size) == (
+            buffer.position,
+            buffer.size,
+        )
+        for tensor, array in zip(device_buffer._columns(), buffer._columns()):
+            assert torch.is_tensor(tensor)
+            np.testing.assert_array_equal(tensor.cpu().numpy(), array)
+
+    states, actions, rewards, next_states, dones = next(_batches([1], 1))
+    device_buffer.add(states[0], actions[0], rewards[0], next_states[0], 1.0)
+    buffer.add(states[0], actions[0], rewards[0], next_states[0], 1.0)
+    for tensor, array in zip(device_buffer._columns(), buffer._columns()):
+        np.testing.assert_array_equal(tensor.cpu().numpy(), array)
+
+
+def test_samples_are_stored_rows():
+    device_buffer = DeviceReplayBuffer(STATE_SIZE, ACTION_SIZE, 0, 16, 8)
+    for batch in _batches([5, 7]):
+        device_buffer.add_batch(*batch)
+    states = device_buffer.states[: device_buffer.size].cpu().numpy()
+    for experiences in device_buffer.sample_passes(4):
+        assert all(field.shape[0] == 8 for field in experiences)
+        for state in experiences[0].cpu().numpy():
+            assert (states == state).all(axis=1).any()
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from agent import MemmapReplayBuffer, ReplayBuffer
+
+STATE_SIZE = 3
+ACTION_SIZE = 2
+
+
+def _batch(n, seed):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.standard_normal((n, STATE_SIZE)),
+        rng.standard_normal((n, ACTION_SIZE)),
+        rng.standard_normal(n),
+        rng.standard_normal((n, STATE_SIZE)),
+        rng.random(n) < 0.5,
+    )
+
+
+def _open(path, buffer_size=10, state_size=STATE_SIZE):
+    return MemmapReplayBuffer(
+        state_size, ACTION_SIZE, 0, buffer_size, 4, str(path)
+    )
+
+
+def test_reopening_resumes_rows_and_cursor(tmp_path):
+    buffer = _open(tmp_path)
+    reference = ReplayBuffer(STATE_SIZE, ACTION_SIZE, 0, 10, 4)
+    for seed, n in enumerate([4, 5, 3]):
+        buffer.add_batch(*_batch(n, seed))
+        reference.add_batch(*_batch(n, seed))
+    buffer.flush()
+    del buffer
+
+    reopened = _open(tmp_path)
+    assert (reopened.position, reopened.size) == (2, 10)
+    for column, expected in zip(reopened._columns(), reference._columns()):
+        np.testing.assert_array_equal(column, expected)
+
+    # Writing continues at the restored cursor
+    reopened.add_batch(*_batch(1, 9))
+    reference.add_batch(*_batch(1, 9))
+    for column, expected in zip(reopened._columns(), reference._columns()):
+        np.testing.assert_array_equal(column, expected)
+
+
+def test_rejects_a_directory_of_another_shape(tmp_path):
+    _open(tmp_path).add_batch(*_batch(3, 0))
+    with pytest.raises(ValueError):
+        _open(tmp_path, buffer_size=20)
+    with pytest.raises(ValueError):
+        _open(tmp_path, state_size=STATE_SIZE + 1)
+
+
+def test_snapshot_saves_only_the_cursor(tmp_path):
+    buffer = _open(tmp_path / "buffer")
+    buffer.add_batch(*_batch(4, 0))
+    state = buffer.save(str(tmp_path / "snapshot"))
+    assert not (tmp_path / "snapshot").exists()
+
+    buffer.add_batch(*_batch(3, 1))
+    rows = buffer.states.copy()
+    buffer.load(str(tmp_path / "snapshot"), state)
+    assert (buffer.position, buffer.size) == (4, 4)
+    # The rows are not copied: the files keep the later experiences
+    np.testing.assert_array_equal(buffer.states, rows)
+    del buffer
+    reopened = _open(tmp_path / "buffer")
+    assert (reopened.position, reopened.size) == (4, 4)
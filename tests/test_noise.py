@@ -0,0 +1,41 @@
+import numpy as np
+
+from agent import VectorOUNoise
+
+
+def test_reset_mask_resets_only_masked_rows():
+    noise = VectorOUNoise(4, 3, seed=0, mu=0.5, block_size=8)
+    for _ in range(5):
+        noise.sample()
+    before = noise.state.copy()
+    assert not np.any(before == 0.5)
+
+    noise.reset([True, False, False, True])
+    np.testing.assert_array_equal(noise.state[[0, 3]], 0.5)
+    np.testing.assert_array_equal(noise.state[[1, 2]], before[[1, 2]])
+
+    noise.reset()
+    np.testing.assert_array_equal(noise.state, 0.5)
+
+
+def test_processes_are_independent_and_follow_ou_dynamics():
+    noise = VectorOUNoise(2, 1, seed=0, theta=0.15, sigma=0.2, block_size=8)
+    rng = np.random.default_rng(0)
+    # Blocks of block_size steps are drawn from the same generator
+    increments = [0.2 * rng.standard_normal((8, 2, 1)) for _ in range(3)]
+    expected = np.zeros((2, 1))
+    for step in range(20):
+        expected = expected + 0.15 * (0.0 - expected)
+        expected += increments[step // 8][step % 8]
+        np.testing.assert_allclose(noise.sample(), expected, atol=1e-12)
+    assert noise.state[0, 0] != noise.state[1, 0]
+
+
+def test_state_dict_roundtrip_continues_the_same_stream():
+    noise = VectorOUNoise(3, 2, seed=1, block_size=4)
+    for _ in range(6):
+        noise.sample()
+    copy = VectorOUNoise(3, 2, seed=2, block_size=4)
+    copy.load_state_dict(noise.state_dict())
+    for _ in range(10):
+        np.testing.assert_array_equal(copy.sample(), noise.sample())
@@ -0,0 +1,41 @@
+import numpy as np
+import torch
+
+from model import Actor, export_numpy_policy
+from numpy_policy import NumpyPolicy
+
+
+def _trained_like_actor(state_size=24, action_size=2):
+    actor = Actor(state_size, action_size, seed=0)
+    generator = torch.Generator().manual_seed(1)
+    with torch.no_grad():
+        # Batch norm statistics and a last layer far from their initial
+        # values, so that folding bn1 into fc2 is actually exercised
+        bn = actor.bn1
+        bn.running_mean.copy_(torch.rand(bn.num_features, generator=generator))
+        bn.running_var.copy_(
+            0.5 + torch.rand(bn.num_features, generator=generator)
+        )
+        bn.weight.copy_(torch.randn(bn.num_features, generator=generator))
+        bn.bias.copy_(torch.randn(bn.num_features, generator=generator))
+        actor.fc3.weight.normal_(0, 0.1, generator=generator)
+    return actor.eval()
+
+
+def test_matches_actor_forward(tmp_path):
+    actor = _trained_like_actor()
+    path = tmp_path / "policy.npz"
+    export_numpy_policy(actor, path)
+    policy = NumpyPolicy.load(path)
+    assert (policy.state_size, policy.action_size) == (24, 2)
+
+    states = np.random.default_rng(0).standard_normal((64, 24))
+    with torch.no_grad():
+        expected = actor(torch.from_numpy(states).float()).numpy()
+    actions = policy.act(states)
+    assert actions.shape == (64, 2)
+    assert np.abs(expected).max() > 0.1
+    np.testing.assert_allclose(actions, expected, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(
+        policy.act(states[0]), expected[:1], rtol=1e-4, atol=1e-5
+    )
@@ -0,0 +1,74 @@
+import numpy as np
+
+from agent import PrioritizedReplayBuffer, SumTree
+
+STATE_SIZE = 3
+ACTION_SIZE = 2
+
+
+def _filled_buffer(buffer_size, batch_size, **kwargs):
+    buffer = PrioritizedReplayBuffer(
+        STATE_SIZE, ACTION_SIZE, 0, buffer_size, batch_size, **kwargs
+    )
+    # The state of row i holds i, so sampled experiences map back to rows
+    states = np.repeat(np.arange(buffer_size)[:, None], STATE_SIZE, axis=1)
+    buffer.add_batch(
+        states,
+        np.zeros((buffer_size, ACTION_SIZE)),
+        np.zeros(buffer_size),
+        states,
+        np.zeros(buffer_size),
+    )
+    return buffer
+
+
+def test_sum_tree_total_and_find():
+    tree = SumTree(5)
+    tree.update(np.arange(5), [1.0, 2.0, 3.0, 4.0, 5.0])
+    assert tree.total() == 15.0
+    tree.update([1, 3], [0.5, 0.0])
+    assert tree.total() == 9.5
+    np.testing.assert_array_equal(tree[[1, 3]], [0.5, 0.0])
+    # Prefix sums: [0, 1) -> 0, [1, 1.5) -> 1, [1.5, 4.5) -> 2, [4.5, 9.5) -> 4
+    np.testing.assert_array_equal(
+        tree.find([0.0, 0.99, 1.2, 1.5, 4.4, 4.5, 11.0]), [0, 0, 1, 2, 2, 4, 4]
+    )
+    tree.tree[1 : tree.tree_capacity] = 0
+    tree.rebuild()
+    assert tree.total() == 9.5
+
+
+def test_sampling_follows_priorities():
+    buffer = _filled_buffer(8, 32, alpha=1.0)
+    td_errors = np.array([1.0, 2.0, 3.0, 4.0, 0.0, 0.0, 6.0, 8.0])
+    buffer.update_priorities(np.arange(8), td_errors)
+
+    counts = np.zeros(8)
+    for _ in range(500):
+        experiences, _, idx = buffer.sample()
+        rows = experiences[0][:, 0].cpu().numpy().astype(int)
+        np.testing.assert_array_equal(rows, idx)
+        counts += np.bincount(idx, minlength=8)
+    expected = (td_errors + buffer.epsilon) / (
+        td_errors + buffer.epsilon
+    ).sum()
+    np.testing.assert_allclose(counts / counts.sum(), expected, atol=0.01)
+
+
+def test_importance_sampling_weights():
+    buffer = _filled_buffer(4, 16, alpha=1.0, beta=0.5, beta_increment=0.25)
+    buffer.update_priorities(np.arange(4), np.array([1.0, 1.0, 2.0, 4.0]))
+
+    _, weights, idx = buffer.sample()
+    weights = weights.cpu().numpy().ravel()
+    probabilities = buffer.tree[idx] / buffer.tree.total()
+    expected = (4 * probabilities) ** -0.5
+    np.testing.assert_allclose(weights, expected / expected.max(), rtol=1e-6)
+    assert weights.max() == 1.0
+    # The least likely row gets the largest weight
+    assert weights[idx == 0].min() == 1.0
+    assert buffer.beta == 0.75
+
+    buffer.sample()
+    buffer.sample()
+    assert buffer.beta == 1.0
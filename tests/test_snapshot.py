@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+import torch
+
+import agent as agent_module
+from agent import Agent
+
+STATE_SIZE = 8
+ACTION_SIZE = 2
+NUM_AGENTS = 2
+REPLAY_OPTIONS = [
+    {},
+    {"compact_replay": True},
+    {"prioritized_replay": True},
+    {"replay_on_device": True},
+]
+
+
+def _agent(**kwargs):
+    return Agent(
+        STATE_SIZE,
+        ACTION_SIZE,
+        seed=0,
+        buffer_size=64,
+        batch_size=16,
+        learning_passes=2,
+        update_every=1,
+        num_agents=NUM_AGENTS,
+        **kwargs
+    )
+
+
+class _Episodes:
+    """Steps of short episodes, whose next states are the next states."""
+
+    def __init__(self, seed):
+        self.rng = np.random.default_rng(seed)
+        self.states = self._observe()
+        self.t = 0
+
+    def _observe(self):
+        return self.rng.standard_normal((NUM_AGENTS, STATE_SIZE))
+
+    def run(self, agent, n_steps):
+        """Act and learn for n_steps, return the actions taken."""
+        taken = []
+        for _ in range(n_steps):
+            self.t += 1
+            actions = agent.act_all(self.states)
+            next_states = self._observe()
+            dones = np.full(NUM_AGENTS, self.t % 7 == 0)
+            agent.step_all(
+                self.states,
+                actions,
+                self.rng.standard_normal(NUM_AGENTS),
+                next_states,
+                dones,
+                episode_number=self.t,
+            )
+            taken.append(actions.copy())
+            self.states = self._observe() if dones.any() else next_states
+        return np.array(taken)
+
+
+def _replay_arrays(agent):
+    buffer = agent.replay_buffer
+    arrays = dict(buffer._row_arrays(), **buffer._other_arrays())
+    # Copies: on the CPU, Tensor.numpy shares the memory of the buffer
+    return {
+        name: np.array(array.cpu() if torch.is_tensor(array) else array)
+        for name, array in arrays.items()
+    }
+
+
+def _parameters(agent):
+    return [
+        p.detach().clone()
+        for net in (agent.actor_local, agent.critic_local, agent.critic_target)
+        for p in net.parameters()
+    ]
+
+
+@pytest.mark.parametrize("options", REPLAY_OPTIONS)
+def test_restored_agent_continues_identically(tmp_path, options):
+    agent = _agent(**options)
+    episodes = _Episodes(seed=0)
+    # Three snapshots, so both replay slots are written incrementally, with
+    # the ring wrapped around several times in between
+    for _ in range(3):
+        episodes.run(agent, 40)
+        agent.snapshot(str(tmp_path))
+    assert agent.replay_buffer.rows_written > 3 * 64
+    saved_replay = _replay_arrays(agent)
+    saved_state = (episodes.rng.bit_generator.state, episodes.states, 120)
+
+    expected_actions = episodes.run(agent, 10)
+    expected_parameters = _parameters(agent)
+
+    restored = _agent(**options)
+    restored.restore(str(tmp_path))
+    for name, array in _replay_arrays(restored).items():
+        np.testing.assert_array_equal(array, saved_replay[name], name)
+    episodes.rng.bit_generator.state, episodes.states, episodes.t = saved_state
+    np.testing.assert_array_equal(episodes.run(restored, 10), expected_actions)
+    for got, expected in zip(_parameters(restored), expected_parameters):
+        assert torch.equal(got, expected)
+
+
+@pytest.mark.parametrize("options", REPLAY_OPTIONS)
+def test_interrupted_snapshot_keeps_the_previous_one(
+    tmp_path, monkeypatch, options
+):
+    agent = _agent(**options)
+    episodes = _Episodes(seed=1)
+    episodes.run(agent, 30)
+    agent.snapshot(str(tmp_path))
+    episodes.run(agent, 30)
+    agent.snapshot(str(tmp_path))
+    saved_replay = _replay_arrays(agent)
+    saved_learn_steps = agent.learn_steps
+    saved_actor = {
+        name: value.clone()
+        for name, value in agent.actor_local.state_dict().items()
+    }
+
+    episodes.run(agent, 25)
+    take_rows = agent_module.take_rows
+    calls = []
+
+    def crash(column, rows):
+        # Fail after part of the replay buffer has been written
+        calls.append(rows)
+        if len(calls) > 1:
+            raise KeyboardInterrupt
+        return take_rows(column, rows)
+
+    monkeypatch.setattr(agent_module, "take_rows", crash)
+    with pytest.raises(KeyboardInterrupt):
+        agent.snapshot(str(tmp_path))
+    monkeypatch.undo()
+
+    restored = _agent(**options)
+    restored.restore(str(tmp_path))
+    assert restored.learn_steps == saved_learn_steps
+    for name, value in restored.actor_local.state_dict().items():
+        assert torch.equal(value, saved_actor[name]), name
+    for name, array in _replay_arrays(restored).items():
+        np.testing.assert_array_equal(array, saved_replay[name], name)
+
+
+def test_restore_rejects_another_replay_class(tmp_path):
+    agent = _agent()
+    _Episodes(seed=2).run(agent, 5)
+    agent.snapshot(str(tmp_path))
+    with pytest.raises(ValueError):
+        _agent(compact_replay=True).restore(str(tmp_path))
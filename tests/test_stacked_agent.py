@@ -0,0 +1,108 @@
+import numpy as np
+import torch
+
+from agent import Agent
+from model import Critic
+from stacked_agent import StackedAgent
+
+STATE_SIZE = 8
+ACTION_SIZE = 2
+NUM_AGENTS = 2
+SEEDS = [3, 7, 11]
+
+
+def _agents(**options):
+    options = dict(
+        buffer_size=256, batch_size=16, learning_passes=2, **options
+    )
+    stack = StackedAgent(
+        STATE_SIZE, ACTION_SIZE, SEEDS, num_agents=NUM_AGENTS, **options
+    )
+    agents = [
+        Agent(STATE_SIZE, ACTION_SIZE, seed, num_agents=NUM_AGENTS, **options)
+        for seed in SEEDS
+    ]
+    return stack, agents
+
+
+def _run(stack, agents, n_steps):
+    """Step every seed's standalone agent with the stack's actions."""
+    rng = np.random.default_rng(0)
+    states = rng.standard_normal((len(SEEDS), NUM_AGENTS, STATE_SIZE))
+    for t in range(1, n_steps + 1):
+        actions = stack.act_all(states)
+        for k, agent in enumerate(agents):
+            np.testing.assert_allclose(
+                agent.act_all(states[k]), actions[k], rtol=1e-5, atol=1e-6
+            )
+        rewards = rng.standard_normal((len(SEEDS), NUM_AGENTS))
+        next_states = rng.standard_normal(states.shape)
+        dones = np.full((len(SEEDS), NUM_AGENTS), t % 9 == 0)
+        dones[0] = t % 5 == 0  # seeds end their episodes separately
+        stack.step_all(states, actions, rewards, next_states, dones, t)
+        for k, agent in enumerate(agents):
+            agent.step_all(
+                states[k], actions[k], rewards[k], next_states[k], dones[k], t
+            )
+        states = next_states
+
+
+def test_each_seed_acts_and_stores_like_a_standalone_agent():
+    # No learning: the same noise processes and replay rows, step for step
+    stack, agents = _agents(update_every=10**6)
+    _run(stack, agents, 60)
+    for k, agent in enumerate(agents):
+        for stacked, column in zip(
+            stack.replay_buffer._columns(), agent.replay_buffer._columns()
+        ):
+            np.testing.assert_array_equal(stacked[:, k], column)
+    # Each seed draws its minibatches like the standalone agent
+    for passes in zip(
+        stack.replay_buffer.sample_passes(2),
+        *(agent.replay_buffer.sample_passes(2) for agent in agents),
+    ):
+        stacked, *separate = passes
+        for k, experiences in enumerate(separate):
+            for field, expected in zip(stacked, experiences):
+                assert torch.equal(field[k], expected)
+
+
+def test_each_seed_learns_like_a_standalone_agent():
+    stack, agents = _agents(update_every=10**6)
+    _run(stack, agents, 30)
+    # Adam turns rounding differences in near-zero gradients into lr-sized
+    # steps. SGD steps are proportional to the gradients, so the networks
+    # stay comparable over several rounds.
+    for model in [stack] + agents:
+        model.actor_optimizer = torch.optim.SGD(
+            model.actor_local.parameters(), lr=0.05
+        )
+        model.critic_optimizer = torch.optim.SGD(
+            model.critic_local.parameters(), lr=0.05
+        )
+    for _ in range(5):
+        stack.learn_round()
+        stack.sync_actor()
+        for agent in agents:
+            agent.learn_round()
+            agent.sync_actor()
+    for k, agent in enumerate(agents):
+        for model, net in (
+            (stack.actor(k), agent.actor_local),
+            (stack.critic(k), agent.critic_local),
+        ):
+            for (name, got), expected in zip(
+                model.state_dict().items(), net.state_dict().values()
+            ):
+                np.testing.assert_allclose(
+                    got.numpy(),
+                    expected.cpu().numpy(),
+                    rtol=1e-4,
+                    atol=1e-5,
+                    err_msg=f"seed {SEEDS[k]} {name}",
+                )
+    # The rounds did change the networks
+    initial = Critic(STATE_SIZE, ACTION_SIZE, SEEDS[0])
+    assert not torch.allclose(
+        stack.critic(0).fcs1.weight, initial.fcs1.weight, atol=1e-4
+    )
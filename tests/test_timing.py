@@ -0,0 +1,38 @@
+import threading
+
+from timing import PhaseTimer
+
+
+def test_records_phases():
+    timer = PhaseTimer()
+    with timer("act"):
+        pass
+    timer.add("env", 0.5, calls=2)
+    phases = timer.snapshot()["phases"]
+    assert phases["act"]["calls"] == 1
+    assert phases["env"] == {
+        "seconds": 0.5,
+        "calls": 2,
+        "share": phases["env"]["share"],
+    }
+    assert PhaseTimer(enabled=False).snapshot()["phases"] == {}
+
+
+def test_snapshot_while_another_thread_adds_phases():
+    timer = PhaseTimer()
+    done = threading.Event()
+
+    def record():
+        for i in range(50000):
+            with timer("phase {}".format(i)):
+                pass
+        done.set()
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    while not done.is_set():
+        timer.snapshot()
+    thread.join()
+    phases = timer.snapshot()["phases"]
+    assert len(phases) == 50000
+    assert all(phase["calls"] == 1 for phase in phases.values())
@@ -0,0 +1,92 @@
+"""Wall-clock accounting for the phases of a training loop."""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+
+class PhaseTimer:
+    """Accumulates wall-clock time and call counts per named phase.
+
+    Phases may be recorded from several threads, e.g. by a background
+    learner while the main thread reads `snapshot`.
+
+    Usage:
+        timer = PhaseTimer()
+        with timer("act"):
+            actions = agent.act_all(states)
+        timer.snapshot()
+    """
+
+    def __init__(self, enabled=True):
+        """Initialize the timer.
+
+        Params
+        ======
+            enabled (bool): when False, `timer(phase)` is a no-op context
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget every recorded phase and restart the elapsed clock."""
+        with self._lock:
+            self.seconds = defaultdict(float)
+            self.calls = defaultdict(int)
+            self.started = time.perf_counter()
+
+    def __call__(self, phase):
+        """Returns a context manager that times one call of `phase`."""
+        if not self.enabled:
+            return nullcontext()
+        return _Phase(self, phase)
+
+    def add(self, phase, seconds, calls=1):
+        """Record time measured elsewhere against `phase`."""
+        with self._lock:
+            self.seconds[phase] += seconds
+            self.calls[phase] += calls
+
+    @property
+    def elapsed(self):
+        """Seconds since the timer was created or last reset."""
+        return time.perf_counter() - self.started
+
+    def snapshot(self):
+        """Returns {phase: {"seconds", "calls", "share"}} plus "elapsed".
+
+        `share` is the phase's fraction of the elapsed wall-clock time.
+        """
+        with self._lock:
+            elapsed = self.elapsed
+            seconds = dict(self.seconds)
+            calls = dict(self.calls)
+        phases = {
+            phase: {
+                "seconds": spent,
+                "calls": calls[phase],
+                "share": spent / elapsed if elapsed > 0 else 0.0,
+            }
+            for phase, spent in seconds.items()
+        }
+        return {"elapsed": elapsed, "phases": phases}
+
+
+class _Phase:
+    """Context manager adding the time spent in its block to a PhaseTimer."""
+
+    __slots__ = ("timer", "phase", "start")
+
+    def __init__(self, timer, phase):
+        self.timer = timer
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.phase, time.perf_counter() - self.start)
+        return False
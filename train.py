@@ -0,0 +1,270 @@
+"""Headless MA-DDPG training for Unity environments.
+
+Usage:
+  train (<env>) [options]
+  train --simulator [options]
+  train --help
+
+Options:
+  --episodes=<n>            Maximum number of training episodes [default: 8000].
+  --max-steps=<n>           Stop after this many environment steps, 0 for no limit [default: 0].
+  --stop-score=<x>          Stop once the 100-episode average reaches this score, 0 to never stop [default: 0].
+  --checkpoint-dir=<path>   Directory for the training snapshot [default: checkpoints].
+  --checkpoint-every=<n>    Snapshot the agent every n environment steps [default: 100000].
+  --models-dir=<path>       Directory for the best actor and critic weights [default: trained_models].
+  --report-every=<n>        Print a progress report every n episodes [default: 100].
+  --resume                  Restore the agent from --checkpoint-dir before training [default: False].
+  --seed=<n>                Random seed used for the agent [default: 42].
+  --async-learning          Learn on a background thread while acting [default: False].
+  --mixed-precision         Learn under bfloat16 autocast, slower than float32 on most CPUs [default: False].
+  --profile                 Also report the time the agent spends sampling, in the critic and actor steps and in target updates [default: False].
+  --simulator               Train in the NumPy Tennis simulator (unityagents.TennisSimulator) instead of a Unity environment [default: False].
+  --worker-id=<n>           Number to add to communication port (5005). Used for multi-environment [default: 0].
+"""
+
+import os
+import time
+from collections import deque
+
+import numpy as np
+import torch
+from docopt import docopt
+
+from agent import Agent
+from timing import PhaseTimer
+
+
+class Trainer:
+    """Runs MA-DDPG episodes of an Agent in a UnityEnvironment.
+
+    Every environment step is split into three timed phases: "act"
+    (`agent.act_all`), "env" (`env.step`) and "learn" (`agent.step_all`,
+    which stores the transition and runs any due learning round).
+    """
+
+    def __init__(self, env, agent, brain_name=None, timer=None):
+        """Initialize a Trainer.
+
+        Params
+        ======
+            env (UnityEnvironment): environment to train in
+            agent (Agent): agent to train
+            brain_name (str): brain controlling the agents, defaults to the first one
+            timer (PhaseTimer): timer to record the phases with
+        """
+        self.env = env
+        self.agent = agent
+        self.brain_name = brain_name or env.brain_names[0]
+        self.timer = timer or PhaseTimer()
+        self.env_steps = 0
+        self.episodes = 0
+        self.scores = []
+        self.avg_scores = []
+        self._scores_window = deque(maxlen=100)
+        self._mark = (time.perf_counter(), 0, 0)
+
+    def run_episode(self):
+        """Play and learn from one episode, return the max score over agents."""
+        env, agent, timer = self.env, self.agent, self.timer
+        brain_name = self.brain_name
+        self.episodes += 1
+
+        states = env.reset(train_mode=True)[brain_name].vector_observations
+        score = np.zeros(len(states))
+        while True:
+            with timer("act"):
+                actions = agent.act_all(states)
+            with timer("env"):
+                env_info = env.step(actions)[brain_name]
+            next_states = env_info.vector_observations
+            rewards = env_info.rewards
+            dones = env_info.local_done
+            with timer("learn"):
+                agent.step_all(
+                    states, actions, rewards, next_states, dones, self.episodes
+                )
+            states = next_states
+            score += rewards
+            self.env_steps += 1
+            if np.any(dones):
+                break
+
+        self._scores_window.append(np.max(score))
+        self.scores.append(np.max(score))
+        self.avg_scores.append(np.mean(self._scores_window))
+        return self.scores[-1]
+
+    def train(
+        self,
+        n_episodes=8000,
+        max_steps=None,
+        stop_score=None,
+        checkpoint_dir=None,
+        checkpoint_every=100000,
+        models_dir=None,
+        report_every=100,
+        callback=None,
+    ):
+        """Train until an episode, step or score limit is reached.
+
+        Params
+        ======
+            n_episodes (int): maximum number of episodes
+            max_steps (int): maximum number of environment steps, None for no limit
+            stop_score (float): stop once the 100-episode average reaches it
+            checkpoint_dir (str): directory for `agent.snapshot`, None to disable
+            checkpoint_every (int): environment steps between snapshots
+            models_dir (str): where the best actor and critic weights are saved
+            report_every (int): episodes between progress reports, 0 to disable
+            callback (callable): called as callback(trainer) after every
+                                 episode, training stops when it returns True
+        Returns
+        ======
+            scores, avg_scores (list): per-episode max score and 100-episode average
+        """
+        best_score = -np.inf
+        next_checkpoint = self.env_steps + checkpoint_every
+        for _ in range(n_episodes):
+            self.run_episode()
+            avg_score = self.avg_scores[-1]
+
+            if (
+                checkpoint_dir is not None
+                and self.env_steps >= next_checkpoint
+            ):
+                self.agent.snapshot(checkpoint_dir)
+                next_checkpoint = self.env_steps + checkpoint_every
+            if report_every and self.episodes % report_every == 0:
+                print(self.format_report(self.report()))
+                if models_dir is not None and avg_score > best_score:
+                    self.save_models(models_dir)
+                    best_score = avg_score
+
+            if stop_score is not None and avg_score >= stop_score:
+                print(
+                    "Environment solved in {:d} episodes!\tAverage Score: {:.2f}".format(
+                        self.episodes, avg_score
+                    )
+                )
+                if models_dir is not None:
+                    self.save_models(models_dir)
+                break
+            if max_steps is not None and self.env_steps >= max_steps:
+                break
+            if callback is not None and callback(self):
+                break
+
+        if checkpoint_dir is not None:
+            self.agent.snapshot(checkpoint_dir)
+        return self.scores, self.avg_scores
+
+    def save_models(self, models_dir):
+        """Save the local actor and critic weights like Tennis.ipynb does."""
+        os.makedirs(models_dir, exist_ok=True)
+        torch.save(
+            self.agent.actor_local.state_dict(),
+            os.path.join(models_dir, "checkpoint_actor.pth"),
+        )
+        torch.save(
+            self.agent.critic_local.state_dict(),
+            os.path.join(models_dir, "checkpoint_critic.pth"),
+        )
+
+    def report(self):
+        """Returns throughput since the last report and the phase split so far.
+
+        Keys: episodes, env_steps, avg_score, env_steps_per_sec,
+        updates_per_sec (learner minibatch updates), and phases, the
+        fraction of wall-clock time spent acting, stepping and learning.
+        When the agent profiles itself, agent_phases holds the share of each
+        of its phases (see `Agent.timings`).
+        """
+        now = time.perf_counter()
+        last_time, last_steps, last_updates = self._mark
+        elapsed = max(now - last_time, 1e-9)
+        learn_steps = self.agent.learn_steps
+        self._mark = (now, self.env_steps, learn_steps)
+
+        timing = self.timer.snapshot()
+        report = {
+            "episodes": self.episodes,
+            "env_steps": self.env_steps,
+            "avg_score": self.avg_scores[-1] if self.avg_scores else 0.0,
+            "env_steps_per_sec": (self.env_steps - last_steps) / elapsed,
+            "updates_per_sec": (learn_steps - last_updates) / elapsed,
+            "phases": {
+                phase: values["share"]
+                for phase, values in timing["phases"].items()
+            },
+        }
+        if self.agent.timer.enabled:
+            report["agent_phases"] = {
+                phase: values["share"]
+                for phase, values in self.agent.timings()["phases"].items()
+            }
+        return report
+
+    @staticmethod
+    def format_report(report):
+        phases = " ".join(
+            "{} {:.0%}".format(phase, share)
+            for phase, share in report["phases"].items()
+        )
+        if "agent_phases" in report:
+            phases += "\tagent: " + " ".join(
+                "{} {:.0%}".format(phase, share)
+                for phase, share in report["agent_phases"].items()
+            )
+        return (
+            "Episode {episodes}\tAverage Score: {avg_score:.2f}\t"
+            "steps {env_steps}\t{env_steps_per_sec:.0f} steps/s\t"
+            "{updates_per_sec:.0f} updates/s\t".format(**report) + phases
+        )
+
+
+if __name__ == "__main__":
+    options = docopt(__doc__)
+
+    from unityagents import UnityEnvironment, TennisSimulator
+
+    max_steps = int(options["--max-steps"]) or None
+    stop_score = float(options["--stop-score"]) or None
+
+    if options["--simulator"]:
+        env = UnityEnvironment(
+            communicator=TennisSimulator(seed=int(options["--seed"]))
+        )
+    else:
+        env = UnityEnvironment(
+            file_name=options["<env>"],
+            worker_id=int(options["--worker-id"]),
+            no_graphics=True,
+        )
+    brain_name = env.brain_names[0]
+    env_info = env.reset(train_mode=True)[brain_name]
+    agent = Agent(
+        env_info.vector_observations.shape[1],
+        env.brains[brain_name].vector_action_space_size,
+        seed=int(options["--seed"]),
+        num_agents=len(env_info.agents),
+        async_learning=options["--async-learning"],
+        mixed_precision=options["--mixed-precision"],
+        profile=options["--profile"],
+    )
+    if options["--resume"]:
+        agent.restore(options["--checkpoint-dir"])
+
+    trainer = Trainer(env, agent, brain_name)
+    try:
+        trainer.train(
+            n_episodes=int(options["--episodes"]),
+            max_steps=max_steps,
+            stop_score=stop_score,
+            checkpoint_dir=options["--checkpoint-dir"],
+            checkpoint_every=int(options["--checkpoint-every"]),
+            models_dir=options["--models-dir"],
+            report_every=int(options["--report-every"]),
+        )
+    finally:
+        agent.close()
+        env.close()